@@ -1,11 +1,41 @@
 # src/api.py
-from fastapi import FastAPI, UploadFile, HTTPException
-from fastapi.responses import FileResponse, PlainTextResponse, JSONResponse
+from fastapi import FastAPI, UploadFile, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 import shutil
 import os
 import mimetypes
-from src.pipeline import process_image  # Includes feature extraction, classify, heatmap, severity, report
-from src.models import SessionLocal, UserResult
+import threading
+import csv
+import hashlib
+import io
+import json
+import time
+import zipfile
+from datetime import date, datetime
+from typing import List, Optional
+from PIL import Image
+from sqlalchemy import select
+from src.models import UserResult, session_scope, ASYNC_DB_ENABLED, get_async_sessionmaker
+from src.persistence import result_writer
+from src.stats import get_stats, refresh_rollups
+from src.workspace import RequestWorkspace, load_image
+from src.inference_pool import inference_pool, QueueFullError
+from src.embedding_cache import embedding_cache
+from src.report_cache import report_cache
+from src.quality_gate import quality_gate
+
+WARM_UP_ON_STARTUP = os.environ.get("LEAFGUARD_WARMUP", "1") == "1"
+models_ready = threading.Event()
+MAX_UPLOAD_BYTES = int(float(os.environ.get("LEAFGUARD_MAX_UPLOAD_MB", "20")) * 1024 * 1024)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# /predict_batch/: files per request, and images per forward pass
+MAX_BATCH_FILES = int(os.environ.get("LEAFGUARD_MAX_BATCH_FILES", "256"))
+MAX_BATCH_UPLOAD_BYTES = int(float(os.environ.get("LEAFGUARD_MAX_BATCH_UPLOAD_MB", "512")) * 1024 * 1024)
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+PREDICT_CHUNK_SIZE = int(os.environ.get("LEAFGUARD_PREDICT_CHUNK_SIZE", "16"))
 
 app = FastAPI(
     title="LeafGuard AI API",
@@ -13,10 +43,204 @@ app = FastAPI(
     version="1.0.0"
 )
 
+class UploadLimitMiddleware:
+    """
+    Caps request bodies per path before FastAPI parses the multipart form,
+    which would otherwise receive the whole upload and spool it to a temp
+    file first. Rejects on Content-Length when the client sends one, and
+    otherwise as soon as the bytes received pass the limit.
+    """
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            await JSONResponse({"detail": body_too_large_error(limit).detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised while the form is parsed; FastAPI passes HTTPException through unchanged
+                    raise body_too_large_error(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
 @app.get("/")
 def read_root():
     return PlainTextResponse("🌱 LeafGuard AI API is running. Use /predict/ for plant disease analysis.")
 
+class AnalysisRejected(Exception):
+    """
+    An upload the pipeline refuses to analyse. Raised on the inference pool
+    instead of HTTPException, which cannot cross a process-pool boundary;
+    the endpoint turns it into the HTTP error.
+    """
+
+    def __init__(self, status_code, detail):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def content_hash(contents):
+    """SHA-256 of an upload's bytes; stored with its result to identify the image."""
+    return hashlib.sha256(contents).hexdigest()
+
+def result_row(filename, contents, **fields):
+    """
+    UserResult row for an analysed upload. The workspace holding the upload
+    and its report is deleted once the response is sent, so rows record the
+    original filename and content hash rather than scratch paths.
+    """
+    return dict(fields, image_path=filename or "upload", image_hash=content_hash(contents), report_path="")
+
+def run_analysis(workspace, contents, check_quality=True, filename="upload"):
+    """
+    Blocking part of /predict/: save the upload and run the pipeline.
+    Executed on the inference pool, never on the event loop. Returns the
+    prediction, confidence, severity, report path and the UserResult
+    ``row``, which the caller stores (in this process, so a process-pool
+    worker never holds unwritten rows).
+    """
+    # Imported here so that importing the API (e.g. for /health) does not load the models
+    from src.pipeline import process_image  # Includes feature extraction, classify, heatmap, severity, report
+
+    # Decode once; every pipeline stage reuses this image via the active workspace
+    input_path = workspace.path("input.jpg")
+    try:
+        workspace.add_image(input_path, contents)
+    except (OSError, Image.DecompressionBombError):
+        # Not an image, truncated, or too many pixels to decode safely
+        raise AnalysisRejected(400, "Uploaded file is not a readable image")
+    print(f"File saved to {input_path}. File size: {len(contents)} bytes")
+
+    # Turn away clearly unusable photos before spending the model on them
+    if check_quality:
+        with workspace.activate():
+            reasons, quality = quality_gate.check(input_path)
+    if check_quality and reasons:
+        print(f"Upload rejected by quality gate: {reasons}")
+        raise AnalysisRejected(422, {
+            "message": "Image quality is too low for LeafGuard AI analysis",
+            "reasons": reasons,
+            "recommendations": quality.get("recommendations", []),
+            "quality": quality
+        })
+
+    # Process image through LeafGuard AI pipeline
+    print("Starting image processing pipeline...")
+    started = time.perf_counter()
+    with workspace.activate():
+        prediction, confidence, severity, report_path, enhancement_info = process_image(input_path)
+    quality_gate.record_pipeline(time.perf_counter() - started)
+    print(f"Pipeline completed. Prediction: {prediction}, Confidence: {confidence}, Severity: {severity}")
+
+    # Validate report generation
+    if not os.path.exists(report_path) or os.path.getsize(report_path) < 100:
+        raise Exception("LeafGuard AI report generation failed - PDF is missing or corrupted.")
+    analysis = {
+        "prediction": str(prediction),
+        "confidence": float(confidence) if confidence is not None else None,
+        "severity": float(severity) if severity is not None else None,
+        "report_path": report_path
+    }
+    analysis["row"] = result_row(filename, contents, prediction=analysis["prediction"],
+                                 confidence=analysis["confidence"], severity=analysis["severity"])
+    return analysis
+
+# Latest cache / quality-gate counters of each process-pool worker, by pid
+worker_snapshots = {}
+
+def worker_metrics():
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "report_cache": report_cache.stats(),
+        "quality_gate": quality_gate.stats()
+    }
+
+def run_in_worker(fn, *args):
+    """
+    Process-executor wrapper: run ``fn`` and send back, with its outcome,
+    the worker's pid and counters, which live in that process and would
+    otherwise never reach /metrics.
+    """
+    try:
+        outcome, error = fn(*args), None
+    except Exception as e:
+        outcome, error = None, e
+    return outcome, error, os.getpid(), worker_metrics()
+
+async def run_on_pool(fn, *args, reserved=False):
+    """
+    inference_pool.run(), collecting worker counters when the pool runs
+    processes. ``reserved`` runs in a slot already taken with reserve().
+    """
+    run = inference_pool.run_reserved if reserved else inference_pool.run
+    if inference_pool.kind != "process":
+        return await run(fn, *args)
+    outcome, error, pid, snapshot = await run(run_in_worker, fn, *args)
+    worker_snapshots[pid] = snapshot
+    if error is not None:
+        raise error
+    return outcome
+
+async def read_upload(file):
+    """
+    Read the upload in chunks, rejecting it as soon as it exceeds
+    MAX_UPLOAD_BYTES. Returns the bytearray itself rather than a copy. The
+    request body as a whole is already capped by UploadLimitMiddleware.
+    """
+    # Starlette knows the size once the multipart part is parsed; fail fast when it does
+    if getattr(file, "size", None) is not None and file.size > MAX_UPLOAD_BYTES:
+        raise upload_too_large_error()
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        if len(buffer) > MAX_UPLOAD_BYTES:
+            raise upload_too_large_error()
+    return buffer
+
+def upload_too_large_error():
+    return HTTPException(
+        status_code=413,
+        detail=f"Image exceeds the {MAX_UPLOAD_BYTES / (1024 * 1024):g} MB upload limit"
+    )
+
+app.add_middleware(UploadLimitMiddleware, limits={
+    "/predict/": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD,
+    "/predict_batch/": MAX_BATCH_UPLOAD_BYTES,
+})
+
+def body_too_large_error(limit):
+    return HTTPException(
+        status_code=413,
+        detail=f"Request body exceeds the {limit / (1024 * 1024):.0f} MB limit for this endpoint"
+    )
+
+def queue_full_error():
+    return HTTPException(
+        status_code=503,
+        detail="LeafGuard AI is busy, please retry shortly.",
+        headers={"Retry-After": "1"}
+    )
+
 @app.post("/predict/")
 async def predict(file: UploadFile):
     try:
@@ -35,41 +259,36 @@ async def predict(file: UploadFile):
         if (not content_type or not content_type.startswith('image/')) and ext not in ALLOWED_EXTENSIONS:
             print(f"Invalid file type: {content_type}, extension: {ext}")
             raise HTTPException(status_code=400, detail="Only image files are supported")
+
+        # Shed load before touching the upload if the pool is already full
+        if inference_pool.is_saturated():
+            raise queue_full_error()
+        contents = await read_upload(file)
         
-        # Save uploaded image
-        print(f"Saving file to input.jpg...")
-        with open("input.jpg", "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        print(f"File saved successfully. File size: {os.path.getsize('input.jpg')} bytes")
-        
-        # Process image through LeafGuard AI pipeline
-        print("Starting image processing pipeline...")
-        prediction, confidence, severity, report_path, enhancement_info = process_image("input.jpg")
-        print(f"Pipeline completed. Prediction: {prediction}, Confidence: {confidence}, Severity: {severity}")
-        
-        # Store result in database
-        db = SessionLocal()
-        db_result = UserResult(
-            image_path="input.jpg",
-            prediction=prediction,
-            confidence=confidence,
-            severity=severity,
-            report_path=report_path
-        )
-        db.add(db_result)
-        db.commit()
-        db.refresh(db_result)
-        db.close()
-        
-        # Validate report generation
-        if not os.path.exists(report_path) or os.path.getsize(report_path) < 100:
-            raise Exception("LeafGuard AI report generation failed - PDF is missing or corrupted.")
-        
-        # Return branded PDF report
+        # Each request gets its own scratch directory so concurrent uploads,
+        # heatmaps and reports never overwrite each other
+        workspace = RequestWorkspace()
+        try:
+            analysis = await run_on_pool(run_analysis, workspace, contents, True, filename)
+        except QueueFullError:
+            workspace.cleanup()
+            raise queue_full_error()
+        except AnalysisRejected as e:
+            workspace.cleanup()
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        except BaseException:
+            workspace.cleanup()
+            raise
+
+        # Store result in database (batched write-behind, does not block the response)
+        result_writer.submit(**analysis["row"])
+
+        # Return branded PDF report; the workspace is removed once it has been sent
         return FileResponse(
-            report_path, 
+            analysis["report_path"], 
             media_type='application/pdf', 
-            filename=f"LeafGuard_AI_Report_{file.filename}.pdf"
+            filename=f"LeafGuard_AI_Report_{file.filename}.pdf",
+            background=BackgroundTask(workspace.cleanup)
         )
         
     except HTTPException:
@@ -83,32 +302,385 @@ async def predict(file: UploadFile):
             detail=f"LeafGuard AI analysis failed: {str(e)}"
         )
 
+def analyse_chunk(entries, report_dir=None):
+    """
+    Blocking part of /predict_batch/ for one chunk of saved uploads, given
+    as (index, filename, path). Readable images that pass the quality gate
+    are embedded in one forward pass and classified together. With a
+    ``report_dir`` each of them also goes through the full pipeline, which
+    reuses the cached embedding, and its PDF is moved into that directory
+    under the name given in the result's "report". Returns one result dict
+    per entry, in order, and the UserResult rows for the caller to store.
+    """
+    from src.extract_features import prepare_embedding, embed_prepared
+    from src.classify import classify_with_neighbors
+
+    results = {}
+    rows = []
+    accepted = []
+    prepared = []
+    for index, filename, path in entries:
+        result = {"index": index, "filename": filename}
+        try:
+            image = load_image(path)
+        except (OSError, Image.DecompressionBombError):
+            results[index] = dict(result, status="error", detail="Uploaded file is not a readable image")
+            continue
+        reasons, quality = quality_gate.check(image)
+        if reasons:
+            results[index] = dict(result, status="rejected", reasons=reasons,
+                                  recommendations=quality.get("recommendations", []))
+            continue
+        # Keep only the cache key and model-sized pixels, not the full-resolution decode
+        accepted.append((result, path))
+        prepared.append(prepare_embedding(image))
+
+    if accepted:
+        features = embed_prepared(prepared)
+        for (result, path), classification in zip(accepted, classify_with_neighbors(features)):
+            index = result["index"]
+            if report_dir is None:
+                results[index] = dict(result, status="ok", prediction=str(classification.prediction),
+                                      confidence=float(classification.confidence))
+                with open(path, "rb") as f:
+                    rows.append(result_row(
+                        result["filename"], f.read(),
+                        prediction=str(classification.prediction),
+                        confidence=float(classification.confidence),
+                        severity=None
+                    ))
+                continue
+            # Full pipeline per image in its own workspace so report files never collide
+            workspace = RequestWorkspace()
+            try:
+                with open(path, "rb") as f:
+                    analysis = run_analysis(workspace, f.read(), check_quality=False, filename=result["filename"])
+                rows.append(analysis.pop("row"))
+                report_name = f"{index:04d}_{os.path.splitext(os.path.basename(result['filename']))[0]}.pdf"
+                shutil.move(analysis.pop("report_path"), os.path.join(report_dir, report_name))
+                results[index] = dict(result, status="ok", report=f"reports/{report_name}", **analysis)
+            except Exception as e:
+                detail = e.detail if isinstance(e, AnalysisRejected) else str(e)
+                results[index] = dict(result, status="error", detail=detail)
+            finally:
+                workspace.cleanup()
+    return [results[index] for index, _, _ in entries], rows
+
+async def analyse_batch(entries, report_dir=None):
+    """
+    Yield each entry's result, one chunk (one forward pass) at a time. The
+    caller holds a pool slot from inference_pool.reserve(); chunks run one
+    after another in it, so an admitted batch never waits for capacity.
+    """
+    for start in range(0, len(entries), PREDICT_CHUNK_SIZE):
+        chunk = entries[start:start + PREDICT_CHUNK_SIZE]
+        try:
+            results, rows = await run_on_pool(analyse_chunk, chunk, report_dir, reserved=True)
+            for row in rows:
+                result_writer.submit(**row)
+        except Exception as e:
+            print(f"LeafGuard AI batch chunk failed: {e}")
+            results = [{"index": index, "filename": filename, "status": "error", "detail": str(e)}
+                       for index, filename, _ in chunk]
+        for result in results:
+            yield result
+
+def spool_upload(path, contents):
+    with open(path, "wb") as f:
+        f.write(contents)
+
+class ClosingResponseMixin:
+    """
+    Awaits the ``on_close`` coroutine function once the response is torn
+    down, however that happens: fully sent, failed, or the client gone before
+    the body was started (when a streaming generator's own ``finally`` never
+    runs).
+    """
+
+    def __init__(self, *args, on_close, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close()
+
+class ClosingStreamingResponse(ClosingResponseMixin, StreamingResponse):
+    pass
+
+class ClosingFileResponse(ClosingResponseMixin, FileResponse):
+    pass
+
+@app.post("/predict_batch/")
+async def predict_batch(files: List[UploadFile], reports: bool = False):
+    """
+    Analyse many leaf images in one request. Images are classified in
+    chunks of PREDICT_CHUNK_SIZE per forward pass and one JSON line per
+    image is streamed back as its chunk finishes (application/x-ndjson).
+    With reports=true every image also gets the full PDF report and the
+    response is a zip of the reports plus results.ndjson.
+    """
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_FILES} images per batch")
+    # One slot for the whole batch, released once its response is finished
+    try:
+        inference_pool.reserve()
+    except QueueFullError:
+        raise queue_full_error()
+
+    # Spool every upload into the batch workspace so at most one is held in memory
+    workspace = RequestWorkspace()
+    finished = threading.Lock()
+
+    async def finish():
+        # Called from the stream's finally and from the response teardown; release only once.
+        # The slot goes back at once; removing the spooled uploads, PDFs and zip can take a
+        # while, so it runs on the threadpool rather than the event loop
+        if finished.acquire(blocking=False):
+            inference_pool.release()
+            await run_in_threadpool(workspace.cleanup)
+
+    try:
+        entries = []
+        for index, file in enumerate(files):
+            contents = await read_upload(file)
+            path = workspace.path(f"upload_{index:04d}")
+            await run_in_threadpool(spool_upload, path, contents)
+            entries.append((index, file.filename, path))
+    except BaseException:
+        await finish()
+        raise
+    print(f"Received batch of {len(entries)} images (reports: {reports})")
+
+    if not reports:
+        async def stream():
+            try:
+                async for result in analyse_batch(entries):
+                    yield json.dumps(result) + "\n"
+            finally:
+                await finish()
+        return ClosingStreamingResponse(stream(), media_type="application/x-ndjson", on_close=finish)
+
+    try:
+        report_dir = workspace.path("reports")
+        os.makedirs(report_dir)
+        bundle_path = workspace.path("LeafGuard_AI_Reports.zip")
+        # The zip is written here rather than in the pool (an open ZipFile cannot reach a
+        # worker process), with every write on the threadpool to keep the event loop free.
+        # PDFs are already compressed; only results.ndjson benefits from deflate
+        archive = await run_in_threadpool(zipfile.ZipFile, bundle_path, "w", zipfile.ZIP_STORED)
+        try:
+            lines = []
+            async for result in analyse_batch(entries, report_dir):
+                if "report" in result:
+                    await run_in_threadpool(archive.write, workspace.path(result["report"]), result["report"])
+                lines.append(json.dumps(result) + "\n")
+            await run_in_threadpool(archive.writestr, "results.ndjson", "".join(lines),
+                                    compress_type=zipfile.ZIP_DEFLATED)
+        finally:
+            await run_in_threadpool(archive.close)
+    except BaseException:
+        await finish()
+        raise
+    return ClosingFileResponse(
+        bundle_path,
+        media_type="application/zip",
+        filename="LeafGuard_AI_Reports.zip",
+        on_close=finish
+    )
+
+RESULT_FIELDS = ["id", "image_path", "image_hash", "prediction", "confidence", "severity", "report_path", "timestamp"]
+RESULTS_PAGE_LIMIT = 1000
+EXPORT_BATCH_SIZE = 1000
+
+def result_to_dict(r):
+    return {
+        "id": r.id,
+        "image_path": r.image_path,
+        "image_hash": r.image_hash,
+        "prediction": r.prediction,
+        "confidence": r.confidence,
+        "severity": r.severity,
+        "report_path": r.report_path,
+        "timestamp": r.timestamp.isoformat() if getattr(r, "timestamp", None) is not None else None
+    }
+
+def query_results(after_id=None, prediction=None, min_severity=None, max_severity=None, since=None, until=None):
+    """Select of the filtered results in ascending id order, starting after the ``after_id`` cursor."""
+    query = select(UserResult)
+    if after_id is not None:
+        query = query.where(UserResult.id > after_id)
+    if prediction is not None:
+        query = query.where(UserResult.prediction == prediction)
+    if min_severity is not None:
+        query = query.where(UserResult.severity >= min_severity)
+    if max_severity is not None:
+        query = query.where(UserResult.severity <= max_severity)
+    if since is not None:
+        query = query.where(UserResult.timestamp >= since)
+    if until is not None:
+        query = query.where(UserResult.timestamp < until)
+    return query.order_by(UserResult.id)
+
+async def fetch_results(query):
+    """
+    Run a results select and return its rows as dicts: on the async engine
+    with LEAFGUARD_ASYNC_DB=1, otherwise in a pooled sync session on the
+    threadpool, so the event loop never waits on the database.
+    """
+    if ASYNC_DB_ENABLED:
+        async with get_async_sessionmaker()() as db:
+            return [result_to_dict(r) for r in (await db.execute(query)).scalars()]
+
+    def fetch():
+        with session_scope() as db:
+            return [result_to_dict(r) for r in db.execute(query).scalars()]
+    return await run_in_threadpool(fetch)
+
+def iter_results(**filters):
+    """
+    Every matching result, fetched in keyset-paginated batches with a short
+    session per batch, so exports use constant memory at any table size.
+    """
+    after_id = filters.pop("after_id", None)
+    while True:
+        with session_scope() as db:
+            query = query_results(after_id=after_id, **filters).limit(EXPORT_BATCH_SIZE)
+            batch = [result_to_dict(r) for r in db.execute(query).scalars()]
+        yield from batch
+        if len(batch) < EXPORT_BATCH_SIZE:
+            return
+        after_id = batch[-1]["id"]
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row) + "\n"
+
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=RESULT_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
 @app.get("/results/")
-def get_results():
-    """Get all stored LeafGuard AI analysis results"""
+async def get_results(
+    limit: int = Query(100, ge=1, le=RESULTS_PAGE_LIMIT),
+    cursor: Optional[int] = Query(None, description="Return results with id greater than this (X-Next-Cursor of the previous page)"),
+    prediction: Optional[str] = None,
+    min_severity: Optional[float] = None,
+    max_severity: Optional[float] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    format: str = Query("json", pattern="^(json|ndjson|csv)$")
+):
+    """
+    Get stored LeafGuard AI analysis results, oldest first.
+    format=json returns one page of ``limit`` results; pass the X-Next-Cursor
+    response header back as ``cursor`` for the next page. format=ndjson/csv
+    streams every matching result.
+    """
+    filters = dict(
+        prediction=prediction, min_severity=min_severity, max_severity=max_severity, since=since, until=until
+    )
     try:
-        db = SessionLocal()
-        results = db.query(UserResult).all()
-        db.close()
-        return JSONResponse([
-            {
-                "id": r.id,
-                "image_path": r.image_path,
-                "prediction": r.prediction,
-                "confidence": r.confidence,
-                "severity": r.severity,
-                "report_path": r.report_path,
-                "timestamp": r.timestamp.isoformat() if getattr(r, "timestamp", None) is not None else None
-            }
-            for r in results
-        ])
+        if format == "ndjson":
+            return StreamingResponse(ndjson_lines(iter_results(after_id=cursor, **filters)),
+                                     media_type="application/x-ndjson")
+        if format == "csv":
+            return StreamingResponse(csv_lines(iter_results(after_id=cursor, **filters)), media_type="text/csv",
+                                     headers={"Content-Disposition": "attachment; filename=leafguard_results.csv"})
+
+        # One extra row tells us whether another page exists
+        rows = await fetch_results(query_results(after_id=cursor, **filters).limit(limit + 1))
+        results = rows[:limit]
+        headers = {"X-Next-Cursor": str(results[-1]["id"])} if len(rows) > limit else {}
+        return JSONResponse(results, headers=headers)
     except Exception as e:
         raise HTTPException(
             status_code=500, 
             detail=f"Failed to retrieve LeafGuard AI results: {str(e)}"
         )
 
+@app.get("/stats/")
+def get_statistics(since: Optional[date] = None, until: Optional[date] = None, prediction: Optional[str] = None):
+    """
+    Counts per disease per day, severity and confidence means and histograms,
+    read from the rollup tables (cost grows with days x diseases, not rows).
+    """
+    try:
+        return get_stats(since=since, until=until, prediction=prediction)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to compute LeafGuard AI statistics: {str(e)}"
+        )
+
 @app.get("/health")
 def health_check():
     """Health check endpoint for LeafGuard AI"""
-    return {"status": "healthy", "service": "LeafGuard AI", "version": "1.0.0"}
+    return {
+        "status": "healthy",
+        "service": "LeafGuard AI",
+        "version": "1.0.0",
+        "models_loaded": models_ready.is_set(),
+        "inference_queue": inference_pool.stats()
+    }
+
+def warm_up_models():
+    """Load the backbone and reference set so the first /predict/ is not slow."""
+    try:
+        from src import extract_features, classify
+        extract_features.warm_up()
+        classify.warm_up()
+        import src.pipeline  # noqa: F401
+        models_ready.set()
+        print("LeafGuard AI models warmed up")
+    except Exception as e:
+        print(f"LeafGuard AI warm-up failed: {e}")
+
+def backfill_rollups():
+    try:
+        replayed = result_writer.replay_spool()
+        if replayed:
+            print(f"LeafGuard AI re-queued {replayed} results spooled after failed writes")
+        folded = refresh_rollups()
+        if folded:
+            print(f"LeafGuard AI rolled up {folded} stored results")
+    except Exception as e:
+        print(f"LeafGuard AI rollup refresh failed: {e}")
+
+@app.on_event("startup")
+def start_warm_up():
+    # Fold results stored before the rollup tables existed (or by other writers)
+    threading.Thread(target=backfill_rollups, name="leafguard-rollups", daemon=True).start()
+    # Runs in the background so the server accepts /health immediately
+    if WARM_UP_ON_STARTUP:
+        threading.Thread(target=warm_up_models, name="leafguard-warmup", daemon=True).start()
+
+@app.get("/metrics")
+def metrics():
+    """
+    Runtime metrics of the inference queue, caches and result writer. With
+    the process executor the caches and quality gate live in the workers;
+    their latest counters are listed per pid under worker_processes.
+    """
+    metrics = {
+        "inference_queue": inference_pool.stats(),
+        **worker_metrics(),
+        "result_writer": result_writer.stats()
+    }
+    if inference_pool.kind == "process":
+        metrics["worker_processes"] = {str(pid): snapshot for pid, snapshot in worker_snapshots.items()}
+    return metrics
+
+@app.on_event("shutdown")
+def shutdown_inference_pool():
+    # Let in-flight analyses finish and hand over their rows before the writer flushes and stops
+    inference_pool.shutdown(wait=True)
+    result_writer.close()
@@ -0,0 +1,81 @@
+# src/batching.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-item requests into batches for one model call.
+
+    A background thread waits for the first request, then keeps gathering
+    more for up to ``max_wait_ms`` or until ``max_batch_size`` items are
+    queued. ``batch_fn`` receives the list of items and must return one row
+    per item (anything indexable along its first dimension); row ``i`` is
+    handed back to the caller that submitted item ``i``.
+    """
+
+    def __init__(self, batch_fn, max_batch_size: int = 8, max_wait_ms: float = 5.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.batches_run = 0
+        self.items_processed = 0
+
+    def submit(self, item) -> Future:
+        """Queue ``item`` and return a Future resolving to its output row."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item):
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(item).result()
+
+    @property
+    def average_batch_size(self) -> float:
+        return self.items_processed / self.batches_run if self.batches_run else 0.0
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="leafguard-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                outputs = self.batch_fn(items)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            self.batches_run += 1
+            self.items_processed += len(items)
+            for i, future in enumerate(futures):
+                future.set_result(outputs[i:i + 1])
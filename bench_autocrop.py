@@ -0,0 +1,81 @@
+# src/bench_autocrop.py
+# Auto-crop on multi-megapixel photos: leaf detection at full resolution vs.
+# on a downscaled proxy, and full vs. JPEG draft-mode decode for enhance_image.
+# Usage: python src/bench_autocrop.py [iterations]
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import time
+import cv2
+import numpy as np
+from PIL import Image
+from src.image_enhancement import image_enhancer, ENHANCE_DECODE_SIZE
+from src.workspace import load_rgb_array
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+# 12 MP and 48 MP phone sensors
+SIZES = [(4032, 3024), (8000, 6000)]
+
+
+def leaf_photo(width, height, rng):
+    """Green leaf-like ellipse off-centre on a brown background with sensor noise."""
+    photo = np.empty((height, width, 3), dtype=np.uint8)
+    photo[:] = (120, 90, 60)
+    cv2.ellipse(photo, (width * 2 // 5, height // 2), (width // 5, height // 3), 30, 0, 360, (60, 140, 50), -1)
+    noise = rng.integers(-20, 21, (height // 4, width // 4, 3), dtype=np.int16)
+    noise = cv2.resize(noise.astype(np.float32), (width, height), interpolation=cv2.INTER_NEAREST)
+    return np.clip(photo + noise, 0, 255).astype(np.uint8)
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    return w * h / (aw * ah + bw * bh - w * h)
+
+
+def timed_ms(fn):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn()
+    return (time.perf_counter() - start) / ITERATIONS * 1000
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix="leafguard_bench_")
+    rng = np.random.default_rng(0)
+    for width, height in SIZES:
+        rgb = leaf_photo(width, height, rng)
+        path = os.path.join(workdir, f"leaf_{width}x{height}.jpg")
+        Image.fromarray(rgb).save(path, quality=92)
+        enhanced = image_enhancer._apply_enhancements(rgb)
+
+        full_box = image_enhancer._find_leaf_box(enhanced, proxy_size=None)
+        proxy_box = image_enhancer._find_leaf_box(enhanced)
+        full_ms = timed_ms(lambda: image_enhancer._find_leaf_box(enhanced, proxy_size=None))
+        proxy_ms = timed_ms(lambda: image_enhancer._find_leaf_box(enhanced))
+
+        draft = (ENHANCE_DECODE_SIZE, ENHANCE_DECODE_SIZE)
+        full_decode_ms = timed_ms(lambda: load_rgb_array(path))
+        draft_decode_ms = timed_ms(lambda: load_rgb_array(path, draft_size=draft))
+        draft_shape = load_rgb_array(path, draft_size=draft).shape
+
+        output = os.path.join(workdir, "enhanced.jpg")
+        enhance_ms = timed_ms(lambda: image_enhancer.enhance_image(path, output))
+
+        print(f"{width}x{height} ({width * height / 1e6:.0f} MP)")
+        print(f"  leaf box full-res       {full_ms:8.1f} ms  {full_box}")
+        print(f"  leaf box proxy          {proxy_ms:8.1f} ms  {proxy_box}  IoU {iou(full_box, proxy_box):.4f}")
+        print(f"  decode full             {full_decode_ms:8.1f} ms  {rgb.nbytes / 2 ** 20:.0f} MiB")
+        print(f"  decode draft            {draft_decode_ms:8.1f} ms  {np.prod(draft_shape) / 2 ** 20:.0f} MiB "
+              f"({draft_shape[1]}x{draft_shape[0]})")
+        print(f"  enhance_image total     {enhance_ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
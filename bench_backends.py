@@ -0,0 +1,49 @@
+# src/bench_backends.py
+# Embedding parity and CPU latency/throughput of each DINOv2 inference backend vs. eager float32.
+# Usage: python src/bench_backends.py [batch_size] [iterations]
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import torch
+from src.extract_features import backbone
+from src.inference_backend import BACKENDS, EagerBackend, embedding_parity, PARITY_THRESHOLD, IMAGE_SIZE
+
+BATCH_SIZE = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+ITERATIONS = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+
+def time_backend(backend, pixel_values):
+    backend(pixel_values)  # warm-up
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        backend(pixel_values)
+    return (time.perf_counter() - start) / ITERATIONS
+
+
+def main():
+    model = backbone.model
+    pixel_values = torch.randn(BATCH_SIZE, 3, IMAGE_SIZE, IMAGE_SIZE, generator=torch.Generator().manual_seed(0))
+    single = pixel_values[:1]
+    eager = EagerBackend(model)
+    baseline = time_backend(eager, pixel_values)
+
+    print(f"batch {BATCH_SIZE}, {torch.get_num_threads()} threads, parity threshold {PARITY_THRESHOLD}")
+    print(f"{'backend':<12} {'cosine':>8} {'ok':>4} {'ms/img@1':>9} {'ms/batch':>9} {'img/s':>8} {'speedup':>8}")
+    for name, cls in BACKENDS.items():
+        try:
+            backend = eager if name == "eager" else cls(model)
+        except Exception as e:
+            print(f"{name:<12} unavailable: {e}")
+            continue
+        cosine = embedding_parity(eager, backend, pixel_values)
+        per_image = time_backend(backend, single) * 1000
+        per_batch = time_backend(backend, pixel_values)
+        print(f"{name:<12} {cosine:>8.5f} {'yes' if cosine >= PARITY_THRESHOLD else 'NO':>4} "
+              f"{per_image:>9.1f} {per_batch * 1000:>9.1f} {BATCH_SIZE / per_batch:>8.1f} {baseline / per_batch:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
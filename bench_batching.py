@@ -0,0 +1,58 @@
+# src/bench_batching.py
+# Throughput vs. latency of the micro-batched DINOv2 feature extractor.
+# Usage: python src/bench_batching.py [num_requests] [concurrency]
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from src.batching import MicroBatcher
+from src.extract_features import extract_features_batch
+
+NUM_REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+CONCURRENCY = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+BATCH_SIZES = [1, 2, 4, 8, 16]
+MAX_WAIT_MS = 5.0
+
+
+def run(batch_size, images):
+    batcher = MicroBatcher(extract_features_batch, max_batch_size=batch_size, max_wait_ms=MAX_WAIT_MS)
+
+    def timed(image):
+        start = time.perf_counter()
+        batcher(image)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        latencies = list(pool.map(timed, images))
+    elapsed = time.perf_counter() - start
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "throughput": NUM_REQUESTS / elapsed,
+        "p50": np.percentile(latencies_ms, 50),
+        "p95": np.percentile(latencies_ms, 95),
+        "avg_batch": batcher.average_batch_size,
+    }
+
+
+def main():
+    rng = np.random.default_rng(0)
+    images = [Image.fromarray(rng.integers(0, 256, (256, 256, 3), dtype=np.uint8)) for _ in range(NUM_REQUESTS)]
+
+    # Warm up the model so the first measured batch is not penalised
+    extract_features_batch(images[:2])
+
+    print(f"{NUM_REQUESTS} requests, concurrency {CONCURRENCY}, max wait {MAX_WAIT_MS} ms")
+    print(f"{'max_batch':>9} {'img/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'avg batch':>9}")
+    for batch_size in BATCH_SIZES:
+        r = run(batch_size, images)
+        print(f"{batch_size:>9} {r['throughput']:>8.2f} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['avg_batch']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# src/bench_classify.py
+# Per-image classification cost of the batch API vs. looping classify_image.
+# Usage: python src/bench_classify.py [max_batch]
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import numpy as np
+import torch
+from src.classify import classify_batch, classify_image, index
+
+MAX_BATCH = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+REPEATS = 3
+
+
+def best_of(fn):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    dim = index.dim
+    print(f"{len(index)} reference vectors, dim {dim}")
+    print(f"{'N':>6} {'loop us/img':>12} {'batch us/img':>13} {'speedup':>8}")
+    n = 1
+    while n <= MAX_BATCH:
+        features = rng.normal(size=(n, dim)).astype(np.float32)
+        rows = [torch.from_numpy(features[i:i + 1]) for i in range(n)]
+        loop = best_of(lambda: [classify_image(row) for row in rows]) / n * 1e6
+        batch = best_of(lambda: classify_batch(features)) / n * 1e6
+        print(f"{n:>6} {loop:>12.1f} {batch:>13.1f} {loop / batch:>7.1f}x")
+        n *= 4
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# src/bench_enhancement.py
+# ImageEnhancer cost on large phone photos: the original four-pass PIL
+# ImageEnhance chain + BGR/HSV round trip vs. the fused LUT/OpenCV engine.
+# Usage: python src/bench_enhancement.py [iterations] [width] [height]
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import cv2
+import numpy as np
+from PIL import Image, ImageEnhance
+from src.image_enhancement import image_enhancer
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+WIDTH = int(sys.argv[2]) if len(sys.argv) > 2 else 4032
+HEIGHT = int(sys.argv[3]) if len(sys.argv) > 3 else 3024
+
+
+def pil_chain(image, settings):
+    """The previous _apply_enhancements: one full image per ImageEnhance pass."""
+    image = ImageEnhance.Brightness(image).enhance(settings["brightness"])
+    image = ImageEnhance.Contrast(image).enhance(settings["contrast"])
+    image = ImageEnhance.Sharpness(image).enhance(settings["sharpness"])
+    return ImageEnhance.Color(image).enhance(settings["saturation"])
+
+
+def pil_crop_round_trip(image):
+    """The colour conversions of the previous _auto_crop_leaf (crop itself excluded)."""
+    cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+    cv2.cvtColor(cv_image, cv2.COLOR_BGR2HSV)
+    return Image.fromarray(cv2.cvtColor(cv_image, cv2.COLOR_BGR2RGB))
+
+
+def leaf_photo(rng):
+    """Green leaf-like ellipse on a brown background with sensor noise."""
+    photo = np.empty((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    photo[:] = (120, 90, 60)
+    cv2.ellipse(photo, (WIDTH // 2, HEIGHT // 2), (WIDTH // 4, HEIGHT // 3), 30, 0, 360, (60, 140, 50), -1)
+    noise = rng.integers(-20, 21, photo.shape, dtype=np.int16)
+    return np.clip(photo.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def timed_ms(fn):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn()
+    return (time.perf_counter() - start) / ITERATIONS * 1000
+
+
+def main():
+    rgb = leaf_photo(np.random.default_rng(0))
+    image = Image.fromarray(rgb)
+    settings = image_enhancer.enhancement_settings
+
+    pil_ms = timed_ms(lambda: pil_crop_round_trip(pil_chain(image, settings)))
+    numpy_ms = timed_ms(lambda: image_enhancer._apply_enhancements(rgb))
+
+    expected = np.asarray(pil_chain(image, settings)).astype(np.int16)
+    actual = image_enhancer._apply_enhancements(rgb).astype(np.int16)
+    diff = np.abs(expected - actual)
+
+    print(f"image                    {WIDTH}x{HEIGHT}")
+    print(f"PIL chain + round trip   {pil_ms:8.1f} ms")
+    print(f"fused LUT engine         {numpy_ms:8.1f} ms  ({pil_ms / numpy_ms:.1f}x faster)")
+    print(f"difference vs PIL        max {diff.max()}, mean {diff.mean():.3f} (uint8 levels)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# src/bench_heatmap.py
+# Per-request heatmap cost: Grad-CAM (extra forward + backward) vs. the
+# patch-token map taken from the feature-extraction forward pass.
+# Usage: python src/bench_heatmap.py [iterations]
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import numpy as np
+import torch
+from PIL import Image
+from src.extract_features import backbone, extract_hidden_states, patch_token_map
+from src.heatmap_utils import generate_gradcam, generate_token_heatmap
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+NUM_CLASSES = 15
+
+
+class PooledClassifier(torch.nn.Module):
+    """DINOv2 + linear head, standing in for the Grad-CAM model on the same backbone."""
+
+    def __init__(self, model, num_classes):
+        super().__init__()
+        self.model = model
+        self.head = torch.nn.Linear(model.config.hidden_size, num_classes)
+
+    def forward(self, images):
+        return self.head(self.model(pixel_values=images).last_hidden_state.mean(dim=1))
+
+
+def timed_ms(fn):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn()
+    return (time.perf_counter() - start) / ITERATIONS * 1000
+
+
+def main():
+    rng = np.random.default_rng(0)
+    image = Image.fromarray(rng.integers(0, 256, (480, 640, 3), dtype=np.uint8))
+    classifier = PooledClassifier(backbone.model, NUM_CLASSES)
+    # Conv2d patch projection gives Grad-CAM a [C, H, W] activation map
+    target_layer = backbone.model.embeddings.patch_embeddings.projection
+
+    features_ms = timed_ms(lambda: extract_hidden_states([image]).mean(dim=1))
+    hidden = extract_hidden_states([image])
+    token_ms = timed_ms(lambda: generate_token_heatmap(image, patch_token_map(hidden[0]), return_array=True))
+    gradcam_ms = timed_ms(lambda: generate_gradcam(image, classifier, target_layer, return_array=True))
+
+    print(f"feature forward          {features_ms:8.1f} ms")
+    print(f"+ token heatmap          {token_ms:8.1f} ms")
+    print(f"+ Grad-CAM heatmap       {gradcam_ms:8.1f} ms")
+    print(f"saved per request        {gradcam_ms - token_ms:8.1f} ms "
+          f"({(gradcam_ms - token_ms) / (features_ms + gradcam_ms) * 100:.0f}% of features + Grad-CAM)")
+
+
+if __name__ == "__main__":
+    main()
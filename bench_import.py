@@ -0,0 +1,51 @@
+# src/bench_import.py
+# Guards against import-time regressions: each module is imported in a fresh
+# interpreter and must stay under its time budget (seconds).
+# Usage: python src/bench_import.py   (exits non-zero if a budget is exceeded)
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+REPEATS = 3
+BUDGETS = {
+    "src.models": 1.5,
+    "src.api": 3.0,
+    "src.extract_features": 0.5,
+    "src.classify": 0.5,
+}
+
+SNIPPET = (
+    "import time; start = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def import_time(module):
+    """Best-of-N wall time to import ``module`` in a clean interpreter."""
+    times = []
+    for _ in range(REPEATS):
+        out = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(module=module)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return min(times)
+
+
+def main():
+    failed = False
+    print(f"{'module':<24} {'seconds':>8} {'budget':>8}")
+    for module, budget in BUDGETS.items():
+        elapsed = import_time(module)
+        status = "" if elapsed <= budget else "  OVER BUDGET"
+        failed |= elapsed > budget
+        print(f"{module:<24} {elapsed:>8.3f} {budget:>8.1f}{status}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
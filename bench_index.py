@@ -0,0 +1,77 @@
+# src/bench_index.py
+# Recall@k, kNN accuracy, memory and query latency of the approximate and
+# quantized indexes against exact float32 brute-force search.
+# Usage: python src/bench_index.py [num_queries] [k]
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import numpy as np
+from src.knn_index import BruteForceIndex, IVFIndex, QuantizedIndex
+
+FEATURES_PATH = "data/train_features.npy"
+LABELS_PATH = "data/train_labels.npy"
+NUM_QUERIES = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+K = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+N_PROBES = [1, 2, 4, 8, 16, 32]
+
+
+def latency_ms(index, queries):
+    start = time.perf_counter()
+    for q in queries:
+        index.search(q[None, :], K)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def recall_at_k(approx, exact):
+    return np.mean([len(np.intersect1d(a, e)) / len(e) for a, e in zip(approx, exact)])
+
+
+def accuracy(neighbor_ids, labels, true_labels):
+    """Majority-vote kNN accuracy (ties resolved like classify.py)."""
+    classes, codes = np.unique(labels, return_inverse=True)
+    votes = np.apply_along_axis(np.bincount, 1, codes[neighbor_ids], minlength=len(classes))
+    return np.mean(classes[votes.argmax(axis=1)] == true_labels)
+
+
+def report(name, index, queries, exact_ids, labels, true_labels, nbytes):
+    _, ids = index.search(queries, K)
+    print(f"{name:<20} {recall_at_k(ids, exact_ids):>9.3f} {accuracy(ids, labels, true_labels):>9.3f} "
+          f"{nbytes / 2**20:>9.1f} {latency_ms(index, queries):>9.3f}")
+
+
+def main():
+    features = np.load(FEATURES_PATH).astype(np.float32)
+    labels = np.load(LABELS_PATH)
+    rng = np.random.default_rng(0)
+    query_rows = rng.choice(len(features), min(NUM_QUERIES, len(features)), replace=False)
+    # Perturb reference rows slightly so queries are near, not exact, hits
+    queries = features[query_rows] + rng.normal(0, 0.01, (len(query_rows), features.shape[1])).astype(np.float32)
+    true_labels = labels[query_rows]
+
+    exact = BruteForceIndex(features)
+    _, exact_ids = exact.search(queries, K)
+    print(f"{len(features)} reference vectors, {len(queries)} queries, k={K}")
+    print(f"{'index':<20} {'recall@k':>9} {'accuracy':>9} {'MiB':>9} {'ms/query':>9}")
+    report("brute float32", exact, queries, exact_ids, labels, true_labels, features.nbytes)
+
+    start = time.perf_counter()
+    ivf = IVFIndex.build(features)
+    print(f"(ivf build: {len(ivf.centroids)} lists in {time.perf_counter() - start:.1f}s)")
+    for n_probe in N_PROBES:
+        if n_probe > len(ivf.centroids):
+            break
+        ivf.n_probe = n_probe
+        report(f"ivf n_probe={n_probe}", ivf, queries, exact_ids, labels, true_labels, features.nbytes)
+
+    for storage in ("float16", "int8"):
+        quantized = QuantizedIndex.build(features, storage=storage)
+        report(storage, quantized, queries, exact_ids, labels, true_labels, quantized.nbytes())
+        quantized.exact, quantized.rerank = features, 4
+        report(f"{storage} rerank=4", quantized, queries, exact_ids, labels, true_labels, quantized.nbytes())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# src/bench_report.py
+# PDF report latency: full render vs. the report-cache hit path.
+# Usage: python src/bench_report.py [iterations]
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import time
+import numpy as np
+from PIL import Image
+from src.generate_report import generate_pdf_report, FPDF2
+from src.report_cache import report_cache
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+
+def timed_ms(fn):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn()
+    return (time.perf_counter() - start) / ITERATIONS * 1000
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix="leafguard_bench_")
+    rng = np.random.default_rng(0)
+    image_path = os.path.join(workdir, "leaf.jpg")
+    heatmap_path = os.path.join(workdir, "heatmap.jpg")
+    Image.fromarray(rng.integers(0, 256, (1200, 1600, 3), dtype=np.uint8)).save(image_path, quality=95)
+    Image.fromarray(rng.integers(0, 256, (224, 224, 3), dtype=np.uint8)).save(heatmap_path, quality=95)
+    output_path = os.path.join(workdir, "report.pdf")
+
+    def render(prediction):
+        return lambda: generate_pdf_report(image_path, prediction, 42.0, heatmap_path, output_path)
+
+    # A fresh prediction string per call always misses the cache
+    counter = iter(range(10 ** 9))
+    miss_ms = timed_ms(lambda: render(f"Tomato_Late_blight ({next(counter)}%)")())
+    hit_ms = timed_ms(render("Tomato_Late_blight (97%)"))
+
+    print(f"fpdf2 byte images        {FPDF2}")
+    print(f"full render              {miss_ms:8.2f} ms")
+    print(f"cache hit                {hit_ms:8.2f} ms  ({miss_ms / hit_ms:.1f}x faster)")
+    print(f"report size              {os.path.getsize(output_path) / 1024:8.1f} KiB")
+    print(report_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# src/build_index.py
+# Builds the nearest-neighbour index used by classify.py from the saved training features.
+# Usage: python src/build_index.py [brute|ivf|float16|int8] [n_lists] [n_probe]
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import numpy as np
+from src.knn_index import build_index, save_index
+
+FEATURES_PATH = "data/train_features.npy"
+INDEX_PATH = "data/train_index"
+
+
+def main():
+    kind = sys.argv[1] if len(sys.argv) > 1 else "ivf"
+    params = {}
+    if kind == "ivf":
+        if len(sys.argv) > 2:
+            params["n_lists"] = int(sys.argv[2])
+        if len(sys.argv) > 3:
+            params["n_probe"] = int(sys.argv[3])
+
+    features = np.load(FEATURES_PATH)
+    start = time.perf_counter()
+    index = build_index(features, kind, **params)
+    save_index(index, INDEX_PATH)
+    print(f"Built {kind} index over {len(index)} vectors in {time.perf_counter() - start:.1f}s -> {INDEX_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,140 @@
 # src/classify.py
 import numpy as np
-from sklearn.neighbors import KNeighborsClassifier
 import os
+import threading
+from collections import namedtuple
+from src.knn_index import BruteForceIndex, QuantizedIndex, load_index, index_size
 
 # Load training features and labels
 # These should be pre-saved using extract_features() + labels
 FEATURES_PATH = "data/train_features.npy"
 LABELS_PATH = "data/train_labels.npy"
+# Optional prebuilt index (see build_index.py); falls back to exact search over FEATURES_PATH
+INDEX_PATH = os.environ.get("LEAFGUARD_INDEX_PATH", "data/train_index")
+N_NEIGHBORS = 3
+# Candidates re-scored with exact float32 vectors per neighbour when using a quantized index (0 = off)
+RERANK = int(os.environ.get("LEAFGUARD_RERANK", "0"))
 
-# Load at module level to avoid reloading on every inference
-if os.path.exists(FEATURES_PATH) and os.path.exists(LABELS_PATH):
-    train_features = np.load(FEATURES_PATH)
-    train_labels = np.load(LABELS_PATH)
-    
-    knn = KNeighborsClassifier(n_neighbors=3)
-    knn.fit(train_features, train_labels)
-else:
-    raise FileNotFoundError("Training features or labels not found. Please generate them first.")
+class ReferenceSet:
+    """
+    Training labels and neighbour index, loaded on first use rather than at
+    import so that importing this module stays cheap. Loading is guarded by a
+    lock so concurrent first requests share a single load.
+    """
+
+    def __init__(self):
+        self.index = None
+        self.classes = None
+        self.label_codes = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.index is not None
+
+    def load(self):
+        if self.index is None:
+            with self._lock:
+                if self.index is None:
+                    self._load()
+        return self
+
+    def _load(self):
+        if not (os.path.exists(LABELS_PATH) and (os.path.exists(INDEX_PATH) or os.path.exists(FEATURES_PATH))):
+            raise FileNotFoundError("Training features or labels not found. Please generate them first.")
+        train_labels = np.load(LABELS_PATH)
+        classes, label_codes = np.unique(train_labels, return_inverse=True)
+
+        # An index built before the features were regenerated no longer lines up with the labels
+        use_index = os.path.exists(INDEX_PATH)
+        if use_index and index_size(INDEX_PATH) != len(train_labels):
+            if not os.path.exists(FEATURES_PATH):
+                raise ValueError(
+                    f"Index at {INDEX_PATH} has {index_size(INDEX_PATH)} vectors but there are "
+                    f"{len(train_labels)} labels; rebuild it with build_index.py"
+                )
+            print(f"[classify] index at {INDEX_PATH} does not match {LABELS_PATH} "
+                  f"({index_size(INDEX_PATH)} vs {len(train_labels)} rows); using exact search over {FEATURES_PATH}")
+            use_index = False
+
+        if use_index:
+            index = load_index(INDEX_PATH)
+            if isinstance(index, QuantizedIndex) and RERANK and os.path.exists(FEATURES_PATH):
+                # Exact rows are memory-mapped; only re-ranked candidates are read
+                index.rerank = RERANK
+                index.exact = np.load(FEATURES_PATH, mmap_mode="r")
+        else:
+            # Memory-mapped so worker processes share the page cache instead of private copies
+            index = BruteForceIndex(np.load(FEATURES_PATH, mmap_mode="r"))
+            if len(index) != len(train_labels):
+                raise ValueError(
+                    f"{FEATURES_PATH} has {len(index)} rows but {LABELS_PATH} has {len(train_labels)}; "
+                    "re-run generate_train_features.py"
+                )
+
+        self.classes, self.label_codes = classes, label_codes
+        self.index = index
+
+reference_set = ReferenceSet()
+
+def __getattr__(name):
+    # Module-level access to the reference data loads it on demand
+    if name in ("index", "classes", "label_codes"):
+        return getattr(reference_set.load(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def warm_up():
+    """Load the reference set ahead of the first request."""
+    reference_set.load()
+
+ClassificationResult = namedtuple(
+    "ClassificationResult",
+    ["prediction", "confidence", "probabilities", "neighbor_indices", "distances"]
+)
+
+def _to_numpy(features):
+    if hasattr(features, "detach"):
+        features = features.detach().cpu().numpy()
+    return np.atleast_2d(np.asarray(features, dtype=np.float32))
+
+def _vote(reference, neighbors):
+    """[N, C] class probabilities from a uniform vote over each row's neighbours."""
+    n_rows, n_classes = len(neighbors), len(reference.classes)
+    # Offset each row's class codes so one bincount tallies every row at once
+    codes = reference.label_codes[neighbors] + np.arange(n_rows)[:, None] * n_classes
+    counts = np.bincount(codes.ravel(), minlength=n_rows * n_classes).reshape(n_rows, n_classes)
+    return counts / neighbors.shape[1]
+
+def classify_with_neighbors(features):
+    """
+    Classify [N, D] features (tensor or array) with a single neighbour query.
+    Returns one ClassificationResult per row carrying the predicted class,
+    its confidence, the probability vector over ``classes``, and the
+    indices/distances of the nearest training samples, so reports and
+    similarity lookups can reuse them without searching again.
+    """
+    reference = reference_set.load()
+    distances, neighbors = reference.index.search(_to_numpy(features), N_NEIGHBORS)
+    probs = _vote(reference, neighbors)
+    best = probs.argmax(axis=1)
+    return [
+        ClassificationResult(reference.classes[best[i]], float(probs[i, best[i]]), probs[i], neighbors[i], distances[i])
+        for i in range(len(neighbors))
+    ]
+
+def classify_batch(features):
+    """
+    Vectorized classification of N feature rows at once.
+    features: Torch tensor or array of shape [N, D]
+    Returns:
+        - predicted classes, array of shape [N]
+        - confidence scores, float array of shape [N]
+    """
+    reference = reference_set.load()
+    _, neighbors = reference.index.search(_to_numpy(features), N_NEIGHBORS)
+    probs = _vote(reference, neighbors)
+    best = probs.argmax(axis=1)
+    return reference.classes[best], probs[np.arange(len(best)), best]
 
 def classify_image(features_tensor):
     """
@@ -25,9 +143,5 @@ def classify_image(features_tensor):
         - predicted class (str)
         - confidence score (float between 0 and 1)
     """
-    feature = features_tensor.detach().cpu().numpy()
-    prediction = knn.predict(feature)[0]
-    probs = knn.predict_proba(feature)[0]
-    confidence = max(probs)
-
-    return prediction, confidence
+    result = classify_with_neighbors(features_tensor)[0]
+    return result.prediction, result.confidence
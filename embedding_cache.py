@@ -0,0 +1,72 @@
+# src/embedding_cache.py
+import hashlib
+import os
+import numpy as np
+from src.tiered_cache import TieredCache
+
+# In-memory tier size cap; 0 disables the cache entirely
+EMBEDDING_CACHE_MB = float(os.environ.get("LEAFGUARD_EMBEDDING_CACHE_MB", "64"))
+# Optional on-disk tier shared by every worker on the machine
+EMBEDDING_CACHE_DIR = os.environ.get("LEAFGUARD_EMBEDDING_CACHE_DIR") or None
+# Patch-token maps (HEATMAP_MODE=tokens) share the cache under "<image key>:tokens"
+TOKEN_MAP_SUFFIX = ":tokens"
+
+
+def image_key(image, namespace: str) -> str:
+    """
+    Content key of a decoded PIL image: its pixels, mode and size plus the
+    namespace (model id, preprocessing version, backend), so re-encoded
+    copies of the same photo hit while a model change misses.
+    """
+    digest = hashlib.sha256(namespace.encode())
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def token_map_key(key: str) -> str:
+    """Key of the patch-token map cached alongside the embedding stored under ``key``."""
+    return key + TOKEN_MAP_SUFFIX
+
+
+def _kind(key: str) -> str:
+    return "token_maps" if key.endswith(TOKEN_MAP_SUFFIX) else "embeddings"
+
+
+class EmbeddingCache(TieredCache):
+    """
+    Size-capped LRU of embeddings with an optional on-disk second tier.
+    Token maps share the memory budget but are counted separately, so the
+    embedding hit rate is not inflated by their lookups.
+    """
+
+    suffix = ".npy"
+
+    def _kind(self, key) -> str:
+        return _kind(key)
+
+    def _size(self, embedding) -> int:
+        return embedding.nbytes
+
+    def _load(self, path):
+        return np.load(path)
+
+    def _dump(self, f, embedding):
+        np.save(f, embedding)
+
+    def put(self, key, embedding):
+        super().put(key, np.asarray(embedding, dtype=np.float32))
+
+    def stats(self) -> dict:
+        """Embedding counters, with the token maps sharing the memory budget reported under "token_maps"."""
+        with self._lock:
+            return dict(
+                self._summary("embeddings"),
+                max_bytes=self.max_bytes,
+                disk_tier=self.disk_dir,
+                token_maps=self._summary("token_maps"),
+            )
+
+
+# Global embedding cache instance
+embedding_cache = EmbeddingCache(int(EMBEDDING_CACHE_MB * 1024 * 1024), EMBEDDING_CACHE_DIR)
@@ -1,14 +1,211 @@
 # src/extract_features.py
-from transformers import AutoProcessor, AutoModel
-import torch
 from PIL import Image
+import os
+import threading
+from src.batching import MicroBatcher
+from src.embedding_cache import embedding_cache, image_key, token_map_key
+from src.workspace import load_image, remember
 
-model = AutoModel.from_pretrained("facebook/dinov2-base")
-processor = AutoProcessor.from_pretrained("facebook/dinov2-base", use_fast=True)
+MODEL_ID = "facebook/dinov2-base"
+# Bump whenever preprocess() or the pooling changes so cached embeddings are invalidated
+PREPROCESS_VERSION = "1"
+
+# Dynamic micro-batching of concurrent extract_features() calls
+BATCHING_ENABLED = os.environ.get("LEAFGUARD_BATCHING", "0") == "1"
+MAX_BATCH_SIZE = int(os.environ.get("LEAFGUARD_MAX_BATCH_SIZE", "8"))
+MAX_BATCH_WAIT_MS = float(os.environ.get("LEAFGUARD_MAX_BATCH_WAIT_MS", "5"))
+# "gradcam" (separate forward/backward) or "tokens" (patch-token map from the feature forward)
+HEATMAP_MODE = os.environ.get("LEAFGUARD_HEATMAP_MODE", "gradcam")
+
+class Backbone:
+    """
+    Lazily loaded DINOv2 model and processor.
+    torch/transformers are only imported, and the weights only loaded, on
+    first use; concurrent first callers wait on a lock and share one load.
+    The processor loads on its own, so preprocessing alone (e.g. in
+    DataLoader workers) never loads the model or builds its backend.
+    """
+
+    def __init__(self, model_id):
+        self.model_id = model_id
+        self._model = None
+        self._processor = None
+        self._runner = None
+        self._lock = threading.Lock()
+        self._processor_lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self.load_processor()
+                    from transformers import AutoModel
+                    model = AutoModel.from_pretrained(self.model_id)
+                    model.eval()
+                    from src.inference_backend import create_backend
+                    self._runner = create_backend(model)
+                    self._model = model
+        return self
+
+    def load_processor(self):
+        if self._processor is None:
+            with self._processor_lock:
+                if self._processor is None:
+                    from transformers import AutoProcessor
+                    self._processor = AutoProcessor.from_pretrained(self.model_id, use_fast=True)
+        return self._processor
+
+    @property
+    def model(self):
+        return self.load()._model
+
+    @property
+    def processor(self):
+        return self.load_processor()
+
+    @property
+    def cache_namespace(self):
+        """Identifies the embedding space: model, preprocessing and backend."""
+        return f"{self.model_id}|{PREPROCESS_VERSION}|{self.runner.name}"
+
+    @property
+    def runner(self):
+        """Selected inference backend: pixel_values -> last_hidden_state."""
+        return self.load()._runner
+
+backbone = Backbone(MODEL_ID)
+
+def __getattr__(name):
+    # Keep `from src.extract_features import model, processor` working without eager loading
+    if name == "model":
+        return backbone.model
+    if name == "processor":
+        return backbone.processor
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def preprocess(images):
+    """Resize/normalize PIL images into a [N, 3, H, W] pixel_values tensor."""
+    return backbone.processor(images=images, return_tensors="pt")["pixel_values"]
+
+def embed_pixels(pixel_values):
+    """Run DINOv2 on preprocessed pixels and mean-pool the tokens into [N, D]."""
+    return backbone.runner(pixel_values).mean(dim=1)
+
+def extract_hidden_states(images):
+    """[N, T, D] last_hidden_state (CLS + patch tokens) for a list of PIL images."""
+    return backbone.runner(preprocess(images))
+
+def extract_features_batch(images):
+    """
+    Run DINOv2 on a list of PIL images in a single forward pass.
+    Returns a [N, D] tensor of mean-pooled token embeddings.
+    """
+    return extract_hidden_states(images).mean(dim=1)
+
+def patch_token_map(hidden_state):
+    """
+    Explanation map from one image's [T, D] tokens: cosine similarity of each
+    patch token to the CLS token, on the ViT patch grid, scaled to [0, 1].
+    Costs one [P, D] matrix-vector product on top of the forward pass.
+    """
+    import torch
+    n_side = int((hidden_state.shape[0] - 1) ** 0.5)
+    cls_token, patches = hidden_state[0], hidden_state[-n_side * n_side:]  # skips any register tokens
+    similarity = torch.nn.functional.cosine_similarity(patches, cls_token[None, :], dim=1)
+    grid = similarity.reshape(n_side, n_side)
+    grid = grid - grid.min()
+    return (grid / (grid.max() + 1e-8)).float().numpy()
+
+def prepare_embedding(image):
+    """
+    Reduce a decoded PIL image to what embed_prepared() needs: its cache key
+    and either the cached [1, D] embedding or its [1, 3, H, W] pixel_values.
+    Lets a caller drop the full-resolution decode before the batched forward.
+    """
+    import torch
+    key = None
+    if embedding_cache.enabled:
+        key = image_key(image, backbone.cache_namespace)
+        cached = embedding_cache.get(key)
+        if cached is not None and (HEATMAP_MODE != "tokens" or embedding_cache.get(token_map_key(key)) is not None):
+            return key, torch.from_numpy(cached.copy()), None
+    return key, None, preprocess([image])
+
+def embed_prepared(prepared):
+    """
+    [N, D] embeddings from prepare_embedding() results, with one forward
+    pass over every row the cache did not hold. New rows are cached.
+    """
+    import torch
+    features = [cached for _, cached, _ in prepared]
+    missing = [i for i, row in enumerate(features) if row is None]
+    if missing:
+        hidden = backbone.runner(torch.cat([prepared[i][2] for i in missing]))
+        pooled = hidden.mean(dim=1)
+        for row, i in enumerate(missing):
+            features[i] = pooled[row:row + 1]
+            key = prepared[i][0]
+            if key is not None:
+                # Copy: a view would pin the whole [N, D] batch buffer in the cache
+                embedding_cache.put(key, features[i].numpy().copy())
+                if HEATMAP_MODE == "tokens":
+                    embedding_cache.put(token_map_key(key), patch_token_map(hidden[row]))
+    return torch.cat(features)
+
+def extract_features_cached(images):
+    """
+    [N, D] embeddings of a list of images (paths, PIL images or arrays) with
+    one forward pass for every image the embedding cache does not already
+    hold. Results are cached, so a later extract_features() of the same
+    image (e.g. inside process_image) skips its forward pass. Each image is
+    decoded, keyed and preprocessed in turn, so only one full-resolution
+    decode is alive at a time.
+    """
+    return embed_prepared([prepare_embedding(load_image(image)) for image in images])
+
+# The batcher hands back each caller's [1, T, D] hidden states; callers pool them
+feature_batcher = MicroBatcher(extract_hidden_states, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_BATCH_WAIT_MS)
+
+def warm_up():
+    """Load the backbone and run one dummy forward pass so the first request is not slow."""
+    extract_features_batch([Image.new("RGB", (224, 224))])
 
 def extract_features(image_path):
-    image = Image.open(image_path).convert("RGB")
-    inputs = processor(images=image, return_tensors="pt")
-    with torch.no_grad():
-        output = model(**inputs)
-    return output.last_hidden_state.mean(dim=1)
+    """[1, D] embedding of an image path (reusing the request's decoded upload), PIL image or array."""
+    image = load_image(image_path)
+
+    want_token_map = HEATMAP_MODE == "tokens"
+
+    # Re-uploads of the same photo skip the forward pass entirely
+    key = None
+    if embedding_cache.enabled:
+        key = image_key(image, backbone.cache_namespace)
+        cached = embedding_cache.get(key)
+        token_map = embedding_cache.get(token_map_key(key)) if want_token_map else None
+        if cached is not None and (token_map is not None or not want_token_map):
+            import torch
+            if want_token_map:
+                remember(image_path, "token_map", token_map)
+            return torch.from_numpy(cached.copy())
+
+    if BATCHING_ENABLED:
+        hidden = feature_batcher(image)
+    else:
+        hidden = extract_hidden_states([image])
+    features = hidden.mean(dim=1)
+
+    # Patch-token heatmap for heatmap_utils, derived from this same forward pass
+    if want_token_map:
+        token_map = patch_token_map(hidden[0])
+        remember(image_path, "token_map", token_map)
+        if key is not None:
+            embedding_cache.put(token_map_key(key), token_map)
+
+    if key is not None:
+        # Copy so the cache never shares memory with the tensor handed to the caller
+        embedding_cache.put(key, features.numpy().copy())
+    return features
@@ -0,0 +1,158 @@
+# src/feature_store.py
+import hashlib
+import json
+import os
+import re
+import numpy as np
+
+FEATURE_STORE_DIR = "data/feature_store"
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_sha256(path: str) -> str:
+    """Hex SHA-256 of a file's contents, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FileHashCache:
+    """
+    Remembers the content hash of each path together with its size and
+    mtime, so unchanged files are not re-read on every run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._entries = json.load(f)
+
+    def hash(self, file_path: str) -> str:
+        stat = os.stat(file_path)
+        entry = self._entries.get(file_path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        digest = file_sha256(file_path)
+        self._entries[file_path] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def prune(self, keep_paths):
+        keep = set(keep_paths)
+        self._entries = {p: e for p, e in self._entries.items() if p in keep}
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+
+
+class FeatureStore:
+    """
+    Append-only, content-addressed store of image embeddings.
+
+    Embeddings live under ``root/<model_id>@<preprocess_version>@<backend>/``
+    as ``chunk_NNNNNN.npz`` files, each holding a ``hashes`` array and the
+    matching ``features`` rows. The backend is part of the namespace because
+    bf16/int8/torchscript/onnx runners produce slightly different vectors. Chunks are written atomically, so an
+    interrupted extraction keeps every chunk it finished and a re-run only
+    embeds what is still missing.
+    """
+
+    def __init__(self, model_id: str, preprocess_version: str, backend: str, root: str = FEATURE_STORE_DIR):
+        namespace = re.sub(r"[^A-Za-z0-9_.@-]", "_", f"{model_id}@{preprocess_version}@{backend}")
+        self.root = root
+        self.directory = os.path.join(root, namespace)
+        os.makedirs(self.directory, exist_ok=True)
+        self._index = {}  # hash -> (chunk file, row)
+        self._next_chunk = 0
+        self._load_index()
+
+    def _chunk_files(self):
+        return sorted(f for f in os.listdir(self.directory) if re.fullmatch(r"chunk_\d{6}\.npz", f))
+
+    def _load_index(self):
+        for chunk in self._chunk_files():
+            with np.load(os.path.join(self.directory, chunk)) as data:
+                for row, digest in enumerate(data["hashes"]):
+                    self._index[str(digest)] = (chunk, row)
+            self._next_chunk = max(self._next_chunk, int(chunk[6:12]) + 1)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, digest):
+        return digest in self._index
+
+    @property
+    def dim(self) -> int:
+        """Embedding width, read from one stored chunk (0 while the store is empty)."""
+        for chunk, _ in self._index.values():
+            with np.load(os.path.join(self.directory, chunk)) as data:
+                return data["features"].shape[1]
+        return 0
+
+    def missing(self, hashes):
+        """Unique hashes (in first-seen order) that have no stored embedding."""
+        return [h for h in dict.fromkeys(hashes) if h not in self._index]
+
+    def append(self, hashes, features):
+        """Persist a batch of embeddings as a new chunk."""
+        if len(hashes) == 0:
+            return
+        chunk = f"chunk_{self._next_chunk:06d}.npz"
+        self._write_chunk(chunk, np.array(hashes), np.asarray(features, dtype=np.float32))
+        for row, digest in enumerate(hashes):
+            self._index[digest] = (chunk, row)
+        self._next_chunk += 1
+
+    def _write_chunk(self, chunk, hashes, features):
+        path = os.path.join(self.directory, chunk)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, hashes=hashes, features=features)
+        os.replace(tmp_path, path)
+
+    def gather(self, hashes, out):
+        """Copy the embedding of ``hashes[i]`` into ``out[i]``, one chunk at a time."""
+        by_chunk = {}
+        for i, digest in enumerate(hashes):
+            chunk, row = self._index[digest]
+            by_chunk.setdefault(chunk, ([], []))
+            by_chunk[chunk][0].append(i)
+            by_chunk[chunk][1].append(row)
+        for chunk, (positions, rows) in by_chunk.items():
+            with np.load(os.path.join(self.directory, chunk)) as data:
+                out[positions] = data["features"][rows]
+        return out
+
+    def compact(self, keep_hashes):
+        """
+        Drop embeddings whose hash is not in ``keep_hashes`` by rewriting
+        the affected chunks. Returns the number of entries removed.
+        """
+        keep = set(keep_hashes)
+        stale = [h for h in self._index if h not in keep]
+        if not stale:
+            return 0
+        stale_chunks = {self._index[h][0] for h in stale}
+        for chunk in sorted(stale_chunks):
+            path = os.path.join(self.directory, chunk)
+            with np.load(path) as data:
+                hashes = data["hashes"]
+                mask = np.array([str(h) in keep for h in hashes], dtype=bool)
+                features = data["features"][mask]
+                hashes = hashes[mask]
+            if len(hashes):
+                self._write_chunk(chunk, hashes, features)
+            else:
+                os.remove(path)
+        # Rows shifted inside the rewritten chunks
+        self._index = {}
+        self._next_chunk = 0
+        self._load_index()
+        return len(stale)
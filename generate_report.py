@@ -1,15 +1,56 @@
+import fpdf
 from fpdf import FPDF
+import io
 import os
+from functools import lru_cache
 from src.disease_info import DISEASE_INFO
+from src.report_cache import report_cache, report_key
+from src.workspace import workspace_path
 from datetime import datetime
 
-def generate_pdf_report(image_path, prediction, severity, heatmap_path):
-    # Extract class name (remove confidence if present)
-    class_name = prediction.split(' (')[0]
+# fpdf2 embeds images straight from in-memory bytes; PyFPDF 1.x needs a path
+FPDF2 = int(fpdf.FPDF_VERSION.split(".")[0]) >= 2
+
+@lru_cache(maxsize=None)
+def disease_text(class_name):
+    """Description and treatment paragraphs for a class, formatted once per process."""
     info = DISEASE_INFO.get(class_name, {
         "description": "No description available.",
         "treatment": "No treatment advice available."
     })
+    return f"Description: {info['description']}", f"Treatment Advice: {info['treatment']}"
+
+def read_bytes(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+def pdf_bytes(pdf):
+    if FPDF2:
+        return bytes(pdf.output())
+    return pdf.output(dest="S").encode("latin-1")
+
+def generate_pdf_report(image_path, prediction, severity, heatmap_path, output_path=None):
+    # Write into the current request's workspace so concurrent reports never collide
+    report_path = output_path or workspace_path("LeafGuard_AI_Report.pdf")
+
+    # Identical analyses (same image, heatmap and result) reuse the finished PDF,
+    # including its "Generated on" time from the first render
+    image_bytes = read_bytes(image_path)
+    heatmap_bytes = read_bytes(heatmap_path)
+    key = None
+    if image_bytes is not None and report_cache.enabled:
+        key = report_key(image_bytes, heatmap_bytes, prediction, severity)
+        cached = report_cache.get(key)
+        if cached is not None:
+            with open(report_path, "wb") as f:
+                f.write(cached)
+            return report_path
+
+    # Extract class name (remove confidence if present)
+    class_name = prediction.split(' (')[0]
+    description, treatment = disease_text(class_name)
 
     pdf = FPDF()
     pdf.add_page()
@@ -52,9 +93,9 @@ def generate_pdf_report(image_path, prediction, severity, heatmap_path):
     pdf.cell(200, 10, "DISEASE INFORMATION", ln=1)
     
     pdf.set_font("Arial", size=11)
-    pdf.multi_cell(0, 8, f"Description: {info['description']}")
+    pdf.multi_cell(0, 8, description)
     pdf.cell(200, 5, "", ln=1)  # Spacing
-    pdf.multi_cell(0, 8, f"Treatment Advice: {info['treatment']}")
+    pdf.multi_cell(0, 8, treatment)
     
     # Images section
     pdf.set_font("Arial", 'B', 12)
@@ -65,9 +106,9 @@ def generate_pdf_report(image_path, prediction, severity, heatmap_path):
     image_added = False
     
     # Original image
-    if os.path.exists(image_path):
+    if image_bytes is not None:
         try:
-            pdf.image(image_path, x=10, y=y_pos, w=80)
+            pdf.image(io.BytesIO(image_bytes) if FPDF2 else image_path, x=10, y=y_pos, w=80)
             pdf.set_font("Arial", size=8)
             pdf.cell(80, 5, "Original Image", ln=0, align='C')
             image_added = True
@@ -75,9 +116,9 @@ def generate_pdf_report(image_path, prediction, severity, heatmap_path):
             print(f"Error adding image {image_path} to PDF: {e}")
     
     # Heatmap image
-    if os.path.exists(heatmap_path):
+    if heatmap_bytes is not None:
         try:
-            pdf.image(heatmap_path, x=110, y=y_pos, w=80)
+            pdf.image(io.BytesIO(heatmap_bytes) if FPDF2 else heatmap_path, x=110, y=y_pos, w=80)
             pdf.set_font("Arial", size=8)
             pdf.cell(80, 5, "AI Heatmap Analysis", ln=1, align='C')
             image_added = True
@@ -95,6 +136,9 @@ def generate_pdf_report(image_path, prediction, severity, heatmap_path):
     pdf.cell(200, 8, "LeafGuard AI - AI-Powered Plant Disease Detection", ln=1, align='C')
     pdf.cell(200, 8, "Protecting crops with intelligent monitoring", ln=1, align='C')
 
-    report_path = "LeafGuard_AI_Report.pdf"
-    pdf.output(report_path)
+    report = pdf_bytes(pdf)
+    with open(report_path, "wb") as f:
+        f.write(report)
+    if key is not None:
+        report_cache.put(key, report)
     return report_path
\ No newline at end of file
@@ -4,30 +4,176 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import json
+import shutil
+import time
 import numpy as np
-from src.extract_features import extract_features
+from PIL import Image
+from torch.utils.data import Dataset, DataLoader
+from src.extract_features import backbone, preprocess, embed_pixels, MODEL_ID, PREPROCESS_VERSION
+from src.feature_store import FeatureStore, FileHashCache
+from src.knn_index import INDEX_META, build_index, save_index
+from src.classify import INDEX_PATH
 
 # Set your dataset directory
 DATASET_DIR = "data/train"  # e.g., data/train/class1/img1.jpg, data/train/class2/img2.jpg
+FEATURES_OUT = "data/train_features.npy"
+LABELS_OUT = "data/train_labels.npy"
 
-features = []
-labels = []
+# Pipeline tuning
+BATCH_SIZE = int(os.environ.get("LEAFGUARD_EXTRACT_BATCH_SIZE", "32"))
+NUM_WORKERS = int(os.environ.get("LEAFGUARD_EXTRACT_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+REPORT_EVERY = 10  # batches
+CHECKPOINT_EVERY = 1024  # embeddings per feature-store chunk
 
-for class_name in os.listdir(DATASET_DIR):
-    class_dir = os.path.join(DATASET_DIR, class_name)
-    if not os.path.isdir(class_dir):
-        continue
-    for fname in os.listdir(class_dir):
-        if fname.lower().endswith(('.jpg', '.jpeg', '.png')):
-            img_path = os.path.join(class_dir, fname)
-            feat = extract_features(img_path)
-            features.append(feat.detach().cpu().numpy().flatten())
-            labels.append(class_name)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
 
-features = np.stack(features)
-labels = np.array(labels)
 
-np.save("data/train_features.npy", features)
-np.save("data/train_labels.npy", labels)
+def list_dataset(dataset_dir):
+    """Return sorted (image_path, class_name) pairs for every image under dataset_dir."""
+    samples = []
+    with os.scandir(dataset_dir) as classes:
+        for class_entry in sorted(classes, key=lambda e: e.name):
+            if not class_entry.is_dir():
+                continue
+            with os.scandir(class_entry.path) as files:
+                for file_entry in sorted(files, key=lambda e: e.name):
+                    if file_entry.is_file() and file_entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                        samples.append((file_entry.path, class_entry.name))
+    return samples
 
-print("Saved features to data/train_features.npy and labels to data/train_labels.npy")
\ No newline at end of file
+
+class LeafImageDataset(Dataset):
+    """Decodes and preprocesses images inside DataLoader worker processes."""
+
+    def __init__(self, paths):
+        self.paths = paths
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, idx):
+        image = Image.open(self.paths[idx]).convert("RGB")
+        return idx, preprocess(image)[0]
+
+
+def iter_embeddings(paths, batch_size=BATCH_SIZE, num_workers=NUM_WORKERS):
+    """
+    Yield (indices, [B, D] float32 embeddings) for ``paths`` batch by batch,
+    printing throughput as it goes.
+    """
+    loader = DataLoader(
+        LeafImageDataset(paths),
+        batch_size=batch_size,
+        num_workers=num_workers,
+        shuffle=False,
+    )
+    backbone.load()
+    done = 0
+    start = time.perf_counter()
+    for batch_idx, (indices, pixel_values) in enumerate(loader):
+        yield indices.numpy(), embed_pixels(pixel_values).cpu().numpy()
+        done += len(indices)
+        if (batch_idx + 1) % REPORT_EVERY == 0 or done == len(paths):
+            elapsed = time.perf_counter() - start
+            print(f"[{done}/{len(paths)}] {done / elapsed:.1f} images/s, elapsed {elapsed:.0f}s")
+
+
+def embed_missing(store, paths, hashes):
+    """Embed the images whose hash is not yet in ``store``, checkpointing every few batches."""
+    missing = set(store.missing(hashes))
+    todo_paths, todo_hashes = [], []
+    for path, digest in zip(paths, hashes):
+        if digest in missing:
+            todo_paths.append(path)
+            todo_hashes.append(digest)
+            missing.discard(digest)
+    if not todo_paths:
+        return 0
+
+    print(f"Embedding {len(todo_paths)} new or changed images "
+          f"(batch size {BATCH_SIZE}, {NUM_WORKERS} decode workers)")
+    pending_hashes, pending_features = [], []
+    for indices, embeddings in iter_embeddings(todo_paths):
+        pending_hashes.extend(todo_hashes[i] for i in indices)
+        pending_features.append(embeddings)
+        if len(pending_hashes) >= CHECKPOINT_EVERY:
+            store.append(pending_hashes, np.concatenate(pending_features))
+            pending_hashes, pending_features = [], []
+    if pending_hashes:
+        store.append(pending_hashes, np.concatenate(pending_features))
+    return len(todo_paths)
+
+
+def export_features(store, hashes, output_path):
+    """
+    Write the stored embeddings for ``hashes`` into a memory-mapped [N, D] array.
+
+    The array is built in a temporary file and renamed over ``output_path``,
+    so API workers that have the old file mapped keep their consistent copy.
+    """
+    tmp_path = f"{output_path}.tmp"
+    features = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=np.float32, shape=(len(hashes), store.dim)
+    )
+    store.gather(hashes, features)
+    features.flush()
+    os.replace(tmp_path, output_path)
+    return features
+
+
+def save_labels(labels, output_path):
+    """np.save ``labels`` via a temporary file renamed into place."""
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, labels)
+    os.replace(tmp_path, output_path)
+
+
+def refresh_index(features, index_path=INDEX_PATH):
+    """
+    Rebuild the neighbour index (same kind as before) over freshly exported
+    features, so classify.py never pairs a stale index with new labels.
+    If it cannot be rebuilt it is removed and exact search is used instead.
+    """
+    if not os.path.exists(index_path):
+        return
+    try:
+        with open(os.path.join(index_path, INDEX_META)) as f:
+            kind = json.load(f)["kind"]
+        index = build_index(np.asarray(features), kind)
+        save_index(index, index_path)
+        print(f"Rebuilt {kind} index over {len(index)} vectors at {index_path}")
+    except Exception as e:
+        shutil.rmtree(index_path, ignore_errors=True)
+        print(f"Removed stale index at {index_path} ({e}); run build_index.py to recreate it")
+
+
+def main():
+    samples = list_dataset(DATASET_DIR)
+    if not samples:
+        raise SystemExit(f"No images found under {DATASET_DIR}")
+    paths = [path for path, _ in samples]
+    labels = np.array([label for _, label in samples])
+
+    # Keyed by the backend actually selected (it may fall back to eager), as in Backbone.cache_namespace
+    store = FeatureStore(MODEL_ID, PREPROCESS_VERSION, backbone.runner.name)
+    hash_cache = FileHashCache(os.path.join(store.root, "file_hashes.json"))
+    hashes = [hash_cache.hash(path) for path in paths]
+    hash_cache.prune(paths)
+    hash_cache.save()
+
+    embedded = embed_missing(store, paths, hashes)
+    dropped = store.compact(hashes)
+    print(f"{len(paths)} images: {embedded} embedded, {len(paths) - embedded} reused, "
+          f"{dropped} stale embeddings dropped")
+
+    features = export_features(store, hashes, FEATURES_OUT)
+    save_labels(labels, LABELS_OUT)
+    refresh_index(features)
+
+    print(f"Saved features to {FEATURES_OUT} and labels to {LABELS_OUT}")
+
+
+if __name__ == "__main__":
+    main()
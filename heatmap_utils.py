@@ -1,84 +1,182 @@
 import torch
 import cv2
 import numpy as np
-from PIL import Image
 import os
+import threading
+import weakref
+from src.workspace import workspace_path, load_image, recall
+from src.extract_features import HEATMAP_MODE
 
-def generate_gradcam(image_path, model, target_layer, class_idx=None, output_path="heatmap.jpg"):
+GRADCAM_SIZE = (224, 224)
+
+
+class GradCAM:
+    """
+    Grad-CAM engine bound to one model / target layer.
+
+    The forward hook is registered once and kept for the engine's lifetime,
+    but it only records activations for the thread currently inside
+    compute(); forwards through the same layer from other threads (e.g.
+    extract_features on a shared backbone) are ignored. The engine holds the
+    model and layer weakly so caching it never keeps them alive.
+    Gradients are taken directly with respect to the hooked activations via
+    torch.autograd.grad, so no parameter .grad buffers are touched, and the
+    class-weighted sum over channels is a single tensor contraction. A whole
+    batch of images and target classes runs in one forward/backward pass.
+    """
+
+    def __init__(self, model, target_layer):
+        self._model = weakref.ref(model)
+        self._layer = weakref.ref(target_layer)
+        self._activations = None
+        self._capturing = None  # ident of the thread inside compute(), if any
+        self._lock = threading.Lock()  # the hook stores per-call state
+        self._handle = target_layer.register_forward_hook(self._save_activations)
+
+    @property
+    def model(self):
+        return self._model()
+
+    @property
+    def target_layer(self):
+        return self._layer()
+
+    def _save_activations(self, module, input, output):
+        if self._capturing == threading.get_ident():
+            self._activations = output
+
+    def compute(self, images, class_idx=None):
+        """
+        Args:
+            images (torch.Tensor): [N, 3, H, W] float batch.
+            class_idx (int | sequence of int, optional): Target class per image. If None, uses predicted classes.
+        Returns:
+            np.ndarray: [N, h, w] maps normalized to [0, 1], at the target layer's resolution.
+        """
+        images = images.detach().requires_grad_(True)
+        with self._lock:
+            model = self.model
+            model.eval()
+            self._capturing = threading.get_ident()
+            try:
+                with torch.enable_grad():
+                    output = model(images)
+            finally:
+                self._capturing = None
+            activations = self._activations  # [N, C, h, w]
+            self._activations = None
+            with torch.enable_grad():
+                if class_idx is None:
+                    targets = output.argmax(dim=1)
+                else:
+                    targets = torch.as_tensor(class_idx, dtype=torch.long).reshape(-1).expand(len(images))
+                # Samples are independent, so one backward of the summed scores yields every per-image gradient
+                score = output.gather(1, targets[:, None]).sum()
+                gradients, = torch.autograd.grad(score, activations)
+
+        weights = gradients.mean(dim=(2, 3))  # [N, C]
+        cams = torch.relu(torch.einsum("nc,nchw->nhw", weights, activations.detach()))
+        cams = cams - cams.amin(dim=(1, 2), keepdim=True)
+        cams = cams / (cams.amax(dim=(1, 2), keepdim=True) + 1e-8)
+        return cams.cpu().numpy()
+
+    def remove(self):
+        self._handle.remove()
+
+
+# One persistent engine per target layer. Engines only hold weak references to
+# their model and layer, so an entry disappears once the layer is collected.
+_engines = weakref.WeakKeyDictionary()
+_engines_lock = threading.Lock()
+
+
+def get_gradcam(model, target_layer):
+    """Return the cached GradCAM engine for ``target_layer``, creating it on first use."""
+    with _engines_lock:
+        engine = _engines.get(target_layer)
+        if engine is None or engine.model is not model:
+            if engine is not None:
+                engine.remove()
+            engine = GradCAM(model, target_layer)
+            _engines[target_layer] = engine
+        return engine
+
+
+def _prepare(image_path):
+    """224x224 RGB uint8 array and its [3, H, W] float tensor in [0, 1]."""
+    img_np = np.array(load_image(image_path).resize(GRADCAM_SIZE))
+    return img_np, torch.from_numpy(img_np).permute(2, 0, 1).float() / 255.0
+
+
+def render_overlay(img_np, cam):
+    """Blend a [h, w] map in [0, 1] over an RGB image as a JET heatmap; returns BGR uint8."""
+    cam = cv2.resize(cam, (img_np.shape[1], img_np.shape[0]))
+    heatmap = cv2.applyColorMap((cam * 255).astype(np.uint8), cv2.COLORMAP_JET)
+    return cv2.addWeighted(cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR), 0.5, heatmap, 0.5, 0)
+
+
+def generate_gradcam_batch(image_paths, model, target_layer, class_indices=None):
+    """
+    Grad-CAM overlays for several images in one forward/backward pass.
+    Args:
+        image_paths (list): Paths, PIL images or RGB arrays.
+        class_indices (list of int, optional): Target class per image. If None, uses predicted classes.
+    Returns:
+        list of np.ndarray: 224x224x3 BGR overlays.
+    """
+    prepared = [_prepare(p) for p in image_paths]
+    batch = torch.stack([tensor for _, tensor in prepared])
+    cams = get_gradcam(model, target_layer).compute(batch, class_indices)
+    return [render_overlay(img_np, cam) for (img_np, _), cam in zip(prepared, cams)]
+
+
+def generate_token_heatmap(image_path, token_map, output_path=None, return_array=False):
+    """
+    Backward-free heatmap: overlay a patch-token map captured during feature
+    extraction (see extract_features.patch_token_map) on the image.
+    Returns the saved path, or the BGR overlay if return_array.
+    """
+    img_np = np.array(load_image(image_path).resize(GRADCAM_SIZE))
+    overlay = render_overlay(img_np, np.asarray(token_map, dtype=np.float32))
+    if return_array:
+        return overlay
+    if output_path is None:
+        output_path = workspace_path("heatmap.jpg")
+    cv2.imwrite(output_path, overlay)
+    print(f"[TokenMap] Saved heatmap to: {output_path}, exists: {os.path.exists(output_path)}")
+    return output_path
+
+
+def generate_gradcam(image_path, model, target_layer, class_idx=None, output_path=None, return_array=False):
     """
     Generate a Grad-CAM heatmap for the given image and model.
     Args:
-        image_path (str): Path to the input image.
+        image_path (str): Path to the input image (or an already decoded PIL image / RGB array).
         model (torch.nn.Module): The model to use.
         target_layer (torch.nn.Module): The layer to compute Grad-CAM for.
         class_idx (int, optional): The class index for which to compute Grad-CAM. If None, uses predicted class.
-        output_path (str): Where to save the heatmap image.
+        output_path (str, optional): Where to save the heatmap image. Defaults to heatmap.jpg in the current request workspace.
+        return_array (bool): Return the 224x224x3 BGR overlay instead of writing it to disk.
     Returns:
-        output_path (str): Path to the saved heatmap image.
+        output_path (str): Path to the saved heatmap image (or the overlay array if return_array).
+
+    With LEAFGUARD_HEATMAP_MODE=tokens, and when extract_features already ran
+    on this image in the current request, the patch-token map from that
+    forward pass is rendered instead and the model is not run again.
     """
-    # Preprocess image
-    img = Image.open(image_path).convert("RGB")
-    img_resized = img.resize((224, 224))
-    img_np = np.array(img_resized)
-    img_tensor = torch.from_numpy(img_np).permute(2, 0, 1).unsqueeze(0).float() / 255.0
-
-    # Enable gradients for input
-    img_tensor.requires_grad = True
-
-    # Hook the gradients and activations
-    activations = []
-    gradients = []
-
-    def forward_hook(module, input, output):
-        activations.append(output.detach())
-
-    def backward_hook(module, grad_in, grad_out):
-        gradients.append(grad_out[0].detach())
-
-    handle_fwd = target_layer.register_forward_hook(forward_hook)
-    handle_bwd = target_layer.register_backward_hook(backward_hook)
-
-    # Forward pass
-    model.eval()
-    output = model(img_tensor)
-    if class_idx is None:
-        class_idx = output.argmax(dim=1).item()
-
-    # Backward pass
-    model.zero_grad()
-    loss = output[0, class_idx]
-    loss.backward()
-
-    # Get hooked data
-    acts = activations[0][0]  # [C, H, W]
-    grads = gradients[0][0]   # [C, H, W]
-
-    # Compute weights and Grad-CAM
-    weights = grads.mean(dim=(1, 2))
-    gradcam = torch.zeros(acts.shape[1:], dtype=torch.float32)
-    for i, w in enumerate(weights):
-        gradcam += w * acts[i]
-    gradcam = torch.relu(gradcam)
-    gradcam = gradcam - gradcam.min()
-    gradcam = gradcam / (gradcam.max() + 1e-8)
-    gradcam = gradcam.cpu().numpy()
-    gradcam = cv2.resize(gradcam, (img_np.shape[1], img_np.shape[0]))
-    heatmap = (gradcam * 255).astype(np.uint8)
-    heatmap = cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
-
-    # Ensure img_np is 3-channel BGR and same size as heatmap
-    if img_np.shape[2] == 1:
-        img_np = cv2.cvtColor(img_np, cv2.COLOR_GRAY2BGR)
-    elif img_np.shape[2] == 3:
-        img_np = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
-    img_np = cv2.resize(img_np, (224, 224))
-
-    # Now both img_np and heatmap are (224, 224, 3)
-    overlay = cv2.addWeighted(img_np, 0.5, heatmap, 0.5, 0)
+    if HEATMAP_MODE == "tokens":
+        token_map = recall(image_path, "token_map")
+        if token_map is not None:
+            return generate_token_heatmap(image_path, token_map, output_path, return_array)
+
+    overlay = generate_gradcam_batch([image_path], model, target_layer,
+                                     None if class_idx is None else [class_idx])[0]
+    if return_array:
+        return overlay
 
+    if output_path is None:
+        output_path = workspace_path("heatmap.jpg")
     # Save the heatmap as a valid .jpg file
     cv2.imwrite(output_path, overlay)
     print(f"[GradCAM] Saved heatmap to: {output_path}, exists: {os.path.exists(output_path)}")
-    handle_fwd.remove()
-    handle_bwd.remove()
-    return output_path
\ No newline at end of file
+    return output_path
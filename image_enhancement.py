@@ -1,10 +1,42 @@
 # src/image_enhancement.py
 import cv2
 import numpy as np
-from PIL import Image, ImageEnhance, ImageFilter
+from PIL import Image
 import os
-from typing import Tuple, Dict, Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple, Dict, Iterable, Iterator, Optional
 import logging
+from src.workspace import load_rgb_array
+
+# Leaf detection for auto-crop runs on a proxy this size (long side, pixels)
+CROP_PROXY_SIZE = 512
+# Images read from disk for enhancement are JPEG-draft decoded at the
+# smallest 1/2, 1/4 or 1/8 scale that keeps both sides at least this large;
+# the output is only 224x224
+ENHANCE_DECODE_SIZE = 672
+# quick_quality() measures on a copy this size (long side, pixels)
+QUALITY_SAMPLE_SIZE = 256
+# Worker processes used by batch_enhance
+ENHANCE_WORKERS = int(os.environ.get("LEAFGUARD_ENHANCE_WORKERS", str(os.cpu_count() or 1)))
+
+def downscale(rgb: np.ndarray, long_side: Optional[int]) -> Tuple[np.ndarray, float]:
+    """
+    Copy of ``rgb`` shrunk to ``long_side`` pixels on its long side (the
+    array itself if already smaller or ``long_side`` is None), and the
+    factor from the copy's coordinates back to the original's.
+    """
+    height, width = rgb.shape[:2]
+    scale = max(height, width) / long_side if long_side else 1.0
+    if scale <= 1.0:
+        return rgb, 1.0
+    # Strided decimation by about half the scale first (cheap), then
+    # area-average the rest of the way so small specks still blend out
+    step = max(1, int(scale) // 2)
+    small = cv2.resize(np.ascontiguousarray(rgb[::step, ::step]),
+                       (max(1, round(width / scale)), max(1, round(height / scale))),
+                       interpolation=cv2.INTER_AREA)
+    return small, scale
 
 class ImageEnhancer:
     def __init__(self):
@@ -28,17 +60,7 @@ class ImageEnhancer:
             str: Path to enhanced image
         """
         try:
-            # Load image
-            original_image = Image.open(image_path)
-            
-            # Apply enhancements
-            enhanced_image = self._apply_enhancements(original_image)
-            
-            # Auto-crop to focus on leaf
-            cropped_image = self._auto_crop_leaf(enhanced_image)
-            
-            # Resize for optimal processing
-            resized_image = self._resize_for_analysis(cropped_image)
+            resized_image = self._enhance(image_path)
             
             # Save enhanced image
             if output_path is None:
@@ -54,84 +76,134 @@ class ImageEnhancer:
             self.logger.error(f"Error enhancing image: {e}")
             return image_path  # Return original if enhancement fails
     
-    def _apply_enhancements(self, image: Image.Image) -> Image.Image:
-        """Apply various image enhancements"""
-        enhanced = image
+    def _enhance(self, image_path) -> Image.Image:
+        """Load, enhance, auto-crop and resize one image; raises on failure."""
+        # Load image as an RGB array (reuses the request's decoded upload when available,
+        # otherwise decodes JPEGs at reduced scale)
+        original_image = load_rgb_array(image_path, draft_size=(ENHANCE_DECODE_SIZE, ENHANCE_DECODE_SIZE))
         
-        # Brightness enhancement
-        brightness_enhancer = ImageEnhance.Brightness(enhanced)
-        enhanced = brightness_enhancer.enhance(self.enhancement_settings["brightness"])
+        # Apply enhancements
+        enhanced_image = self._apply_enhancements(original_image)
+        
+        # Auto-crop to focus on leaf
+        cropped_image = self._auto_crop_leaf(enhanced_image)
+        
+        # Resize for optimal processing
+        return self._resize_for_analysis(cropped_image)
+    
+    def _apply_enhancements(self, image) -> np.ndarray:
+        """
+        Brightness, contrast, sharpness and saturation on one uint8 buffer.
+
+        Same blend formulas as PIL's ImageEnhance chain, in three saturating
+        OpenCV passes: brightness and contrast fused into a 256-entry LUT,
+        sharpness as a weighted sum with a 3x3 box blur (PIL's SMOOTH kernel
+        is 9/13 box + 4/13 centre), and saturation as one 3x4 colour matrix
+        (blend with the greyscale image). Returns a new RGB uint8 array; the
+        input (possibly the request's shared decode) is not modified.
+        """
+        rgb = image if isinstance(image, np.ndarray) else np.asarray(image.convert("RGB"))
+        settings = self.enhancement_settings
+        levels = np.arange(256, dtype=np.float32)
+
+        # Brightness blends with black: v * b
+        brightened = np.clip(np.floor(levels * settings["brightness"]), 0, 255)
+        # Contrast blends with the mean grey level of the brightened image;
+        # a strided sample of it is enough to pin down that single number
+        step = max(1, int(np.sqrt(rgb.shape[0] * rgb.shape[1] / 250000)))
+        sample = brightened.astype(np.uint8)[rgb[::step, ::step]]
+        mean = int(cv2.cvtColor(sample, cv2.COLOR_RGB2GRAY).mean() + 0.5)
+        lut = np.clip(np.trunc(mean + settings["contrast"] * (brightened - mean)), 0, 255).astype(np.uint8)
+        enhanced = cv2.LUT(np.ascontiguousarray(rgb), lut)
+
+        sharpness = settings["sharpness"]
+        if sharpness != 1.0 and min(enhanced.shape[:2]) > 2:
+            # v + s * (v - smooth) with smooth = 9/13 box + 4/13 v
+            box = cv2.boxFilter(enhanced, -1, (3, 3))
+            border = [enhanced[[0, -1]].copy(), enhanced[:, [0, -1]].copy()]
+            weight = (1.0 - sharpness) * 9 / 13
+            # -0.5 turns OpenCV's rounding into PIL's truncation
+            cv2.addWeighted(enhanced, 1.0 - weight, box, weight, -0.5, dst=enhanced)
+            # PIL leaves border pixels unfiltered, so they come out unchanged
+            enhanced[[0, -1]], enhanced[:, [0, -1]] = border
+
+        saturation = settings["saturation"]
+        if saturation != 1.0:
+            # grey + c * (v - grey) for every channel, grey = ITU-R 601-2 luma
+            luma = np.array([[0.299, 0.587, 0.114]], dtype=np.float32)
+            matrix = saturation * np.eye(3, dtype=np.float32) + (1.0 - saturation) * np.ones((3, 1), np.float32) @ luma
+            cv2.transform(enhanced, np.hstack([matrix, np.full((3, 1), -0.5, np.float32)]), dst=enhanced)
+        return enhanced
+    
+    def _find_leaf_box(self, rgb: np.ndarray, proxy_size: Optional[int] = CROP_PROXY_SIZE) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Bounding box (x, y, w, h) of the largest leaf-coloured region in
+        full-resolution pixels, or None. Detection runs on a copy downscaled
+        to ``proxy_size`` on its long side (None = full resolution); the
+        box is then scaled back up to the original image.
+        """
+        height, width = rgb.shape[:2]
+        proxy, scale = downscale(rgb, proxy_size)
+
+        # Single conversion to HSV for leaf detection
+        hsv = cv2.cvtColor(proxy, cv2.COLOR_RGB2HSV)
         
-        # Contrast enhancement
-        contrast_enhancer = ImageEnhance.Contrast(enhanced)
-        enhanced = contrast_enhancer.enhance(self.enhancement_settings["contrast"])
+        # Create mask for green/brown colors (typical leaf colors)
+        lower_green = np.array([35, 40, 40])
+        upper_green = np.array([85, 255, 255])
         
-        # Sharpness enhancement
-        sharpness_enhancer = ImageEnhance.Sharpness(enhanced)
-        enhanced = sharpness_enhancer.enhance(self.enhancement_settings["sharpness"])
+        # Create mask
+        mask = cv2.inRange(hsv, lower_green, upper_green)
         
-        # Color saturation enhancement
-        color_enhancer = ImageEnhance.Color(enhanced)
-        enhanced = color_enhancer.enhance(self.enhancement_settings["saturation"])
+        # Apply morphological operations to clean up mask
+        kernel = np.ones((5, 5), np.uint8)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
         
-        return enhanced
+        # Find contours
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return None
+        
+        # Find the largest contour (likely the main leaf) and its bounding rectangle
+        x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+        
+        # Map back to full resolution, rounding outwards
+        x0, y0 = int(x * scale), int(y * scale)
+        x1 = min(width, int(np.ceil((x + w) * scale)))
+        y1 = min(height, int(np.ceil((y + h) * scale)))
+        return x0, y0, x1 - x0, y1 - y0
     
-    def _auto_crop_leaf(self, image: Image.Image) -> Image.Image:
-        """Automatically crop image to focus on the leaf"""
+    def _auto_crop_leaf(self, image) -> np.ndarray:
+        """Automatically crop image to focus on the leaf (RGB array in, view of it out)"""
+        rgb = image if isinstance(image, np.ndarray) else np.asarray(image.convert("RGB"))
         try:
-            # Convert to OpenCV format
-            cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-            
-            # Convert to HSV for better leaf detection
-            hsv = cv2.cvtColor(cv_image, cv2.COLOR_BGR2HSV)
-            
-            # Create mask for green/brown colors (typical leaf colors)
-            lower_green = np.array([35, 40, 40])
-            upper_green = np.array([85, 255, 255])
-            
-            # Create mask
-            mask = cv2.inRange(hsv, lower_green, upper_green)
-            
-            # Apply morphological operations to clean up mask
-            kernel = np.ones((5, 5), np.uint8)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-            
-            # Find contours
-            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            if contours:
-                # Find the largest contour (likely the main leaf)
-                largest_contour = max(contours, key=cv2.contourArea)
-                
-                # Get bounding rectangle
-                x, y, w, h = cv2.boundingRect(largest_contour)
+            box = self._find_leaf_box(rgb)
+            if box is not None:
+                x, y, w, h = box
                 
                 # Add padding around the crop
                 padding = 20
                 x = max(0, x - padding)
                 y = max(0, y - padding)
-                w = min(cv_image.shape[1] - x, w + 2 * padding)
-                h = min(cv_image.shape[0] - y, h + 2 * padding)
+                w = min(rgb.shape[1] - x, w + 2 * padding)
+                h = min(rgb.shape[0] - y, h + 2 * padding)
                 
                 # Crop the image
-                cropped_cv = cv_image[y:y+h, x:x+w]
-                
-                # Convert back to PIL
-                cropped_pil = Image.fromarray(cv2.cvtColor(cropped_cv, cv2.COLOR_BGR2RGB))
-                
-                return cropped_pil
+                return rgb[y:y+h, x:x+w]
             
         except Exception as e:
             self.logger.warning(f"Auto-crop failed: {e}")
         
         # Return original if cropping fails
-        return image
+        return rgb
     
-    def _resize_for_analysis(self, image: Image.Image) -> Image.Image:
+    def _resize_for_analysis(self, image) -> Image.Image:
         """Resize image to optimal size for AI analysis"""
         # Optimal size for DINOv2 model
         target_size = (224, 224)
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(np.ascontiguousarray(image))
         
         # Maintain aspect ratio
         image.thumbnail(target_size, Image.Resampling.LANCZOS)
@@ -146,45 +218,66 @@ class ImageEnhancer:
         
         return new_image
     
-    def detect_image_quality(self, image_path: str) -> Dict:
-        """Analyze image quality and provide recommendations"""
+    def detect_image_quality(self, image_path) -> Dict:
+        """Analyze image quality and provide recommendations (path, PIL image or RGB array)"""
         try:
-            image = cv2.imread(image_path)
-            if image is None:
+            try:
+                image = load_rgb_array(image_path)
+            except (OSError, ValueError):
                 return {"error": "Could not load image"}
             
-            # Calculate quality metrics
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Sharpness (using Laplacian variance)
-            sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
-            
-            # Brightness
-            brightness = np.mean(gray)
-            
-            # Contrast
-            contrast = np.std(gray)
-            
-            # Resolution
             height, width = image.shape[:2]
-            resolution = width * height
-            
-            # Quality assessment
-            quality_score = self._calculate_quality_score(sharpness, brightness, contrast, resolution)
+            return self._quality_report(cv2.cvtColor(image, cv2.COLOR_RGB2GRAY), width, height)
             
-            return {
-                "sharpness": round(sharpness, 2),
-                "brightness": round(brightness, 2),
-                "contrast": round(contrast, 2),
-                "resolution": resolution,
-                "dimensions": f"{width}x{height}",
-                "quality_score": quality_score,
-                "recommendations": self._get_quality_recommendations(sharpness, brightness, contrast, resolution)
-            }
+        except Exception as e:
+            return {"error": f"Quality analysis failed: {str(e)}"}
+    
+    def quick_quality(self, image) -> Dict:
+        """
+        detect_image_quality() on a copy downscaled to QUALITY_SAMPLE_SIZE
+        (a few milliseconds even for 48 MP photos). Resolution is that of the
+        original; sharpness is measured at the sample's scale, where the same
+        blur reads higher than at full resolution.
+        """
+        try:
+            try:
+                image = load_rgb_array(image)
+            except (OSError, ValueError):
+                return {"error": "Could not load image"}
+            height, width = image.shape[:2]
+            sample, _ = downscale(image, QUALITY_SAMPLE_SIZE)
+            return self._quality_report(cv2.cvtColor(sample, cv2.COLOR_RGB2GRAY), width, height)
             
         except Exception as e:
             return {"error": f"Quality analysis failed: {str(e)}"}
     
+    def _quality_report(self, gray: np.ndarray, width: int, height: int) -> Dict:
+        """Quality metrics, score and recommendations from a greyscale image"""
+        # Sharpness (using Laplacian variance)
+        sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+        
+        # Brightness
+        brightness = np.mean(gray)
+        
+        # Contrast
+        contrast = np.std(gray)
+        
+        # Resolution
+        resolution = width * height
+        
+        # Quality assessment
+        quality_score = self._calculate_quality_score(sharpness, brightness, contrast, resolution)
+        
+        return {
+            "sharpness": round(sharpness, 2),
+            "brightness": round(brightness, 2),
+            "contrast": round(contrast, 2),
+            "resolution": resolution,
+            "dimensions": f"{width}x{height}",
+            "quality_score": quality_score,
+            "recommendations": self._get_quality_recommendations(sharpness, brightness, contrast, resolution)
+        }
+    
     def _calculate_quality_score(self, sharpness: float, brightness: float, 
                                contrast: float, resolution: int) -> float:
         """Calculate overall image quality score (0-100)"""
@@ -221,45 +314,83 @@ class ImageEnhancer:
         
         return recommendations
     
-    def batch_enhance(self, image_paths: list, output_dir: str = "enhanced_images") -> Dict:
-        """Enhance multiple images in batch"""
+    def iter_batch_enhance(self, image_paths: Iterable[str], output_dir: str = "enhanced_images",
+                           workers: int = ENHANCE_WORKERS) -> Iterator[Dict]:
+        """
+        Enhance many images on a process pool, yielding one result per input
+        path in input order: {"original", "enhanced", "quality"} on success,
+        {"path", "error"} on failure.
+
+        ``image_paths`` is consumed lazily and at most ``2 * workers`` images
+        are in flight, so memory stays bounded for folders of any size.
+        Quality metrics come from the in-memory 224x224 result rather than
+        re-reading the saved JPEG. ``workers <= 1`` runs in this process.
+        """
+        # Create output directory
+        os.makedirs(output_dir, exist_ok=True)
+        
+        def jobs():
+            for image_path in image_paths:
+                # Generate output path
+                name, ext = os.path.splitext(os.path.basename(image_path))
+                yield image_path, os.path.join(output_dir, f"{name}_enhanced.jpg")
+        
+        if workers <= 1:
+            for image_path, output_path in jobs():
+                yield _enhance_job(self.enhancement_settings, image_path, output_path)
+            return
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_enhance_worker) as pool:
+            pending = deque()
+            for image_path, output_path in jobs():
+                pending.append(pool.submit(_enhance_job, self.enhancement_settings, image_path, output_path))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    
+    def batch_enhance(self, image_paths: list, output_dir: str = "enhanced_images",
+                      workers: int = ENHANCE_WORKERS) -> Dict:
+        """Enhance multiple images in batch (collects iter_batch_enhance into one dict)"""
         results = {
             "successful": [],
             "failed": [],
             "quality_reports": {}
         }
         
-        # Create output directory
-        os.makedirs(output_dir, exist_ok=True)
-        
-        for image_path in image_paths:
-            try:
-                # Generate output path
-                filename = os.path.basename(image_path)
-                name, ext = os.path.splitext(filename)
-                output_path = os.path.join(output_dir, f"{name}_enhanced.jpg")
-                
-                # Enhance image
-                enhanced_path = self.enhance_image(image_path, output_path)
-                
-                # Analyze quality
-                quality_report = self.detect_image_quality(enhanced_path)
-                
-                results["successful"].append({
-                    "original": image_path,
-                    "enhanced": enhanced_path,
-                    "quality": quality_report
-                })
-                
-                results["quality_reports"][enhanced_path] = quality_report
-                
-            except Exception as e:
-                results["failed"].append({
-                    "path": image_path,
-                    "error": str(e)
-                })
+        for result in self.iter_batch_enhance(image_paths, output_dir, workers):
+            if "error" in result:
+                results["failed"].append(result)
+            else:
+                results["successful"].append(result)
+                results["quality_reports"][result["enhanced"]] = result["quality"]
         
         return results
 
+
+def _init_enhance_worker():
+    # One OpenCV thread per worker process; the pool already uses every core
+    cv2.setNumThreads(1)
+
+
+def _enhance_job(settings: Dict, image_path: str, output_path: str) -> Dict:
+    """Enhance one image to ``output_path`` and report its quality (runs in a pool worker)."""
+    try:
+        enhancer = ImageEnhancer()
+        enhancer.enhancement_settings = dict(settings)
+        enhanced = enhancer._enhance(image_path)
+        enhanced.save(output_path, "JPEG", quality=95)
+        return {
+            "original": image_path,
+            "enhanced": output_path,
+            "quality": enhancer.detect_image_quality(np.asarray(enhanced))
+        }
+    except Exception as e:
+        return {
+            "path": image_path,
+            "error": str(e)
+        }
+
+
 # Global enhancer instance
 image_enhancer = ImageEnhancer() 
\ No newline at end of file
@@ -0,0 +1,152 @@
+# src/inference_backend.py
+import copy
+import os
+import shutil
+import tempfile
+import torch
+
+# Backend used to run the DINOv2 backbone: eager, bf16, int8, torchscript or onnx
+BACKEND = os.environ.get("LEAFGUARD_BACKEND", "eager")
+# Intra-op threads for torch / onnxruntime (0 = library default)
+INTRA_OP_THREADS = int(os.environ.get("LEAFGUARD_INTRA_OP_THREADS", "0"))
+# Minimum cosine similarity to the eager embeddings for a backend to be used
+PARITY_THRESHOLD = float(os.environ.get("LEAFGUARD_PARITY_THRESHOLD", "0.99"))
+IMAGE_SIZE = 224
+
+
+class _HiddenStates(torch.nn.Module):
+    """Tuple-free wrapper so the backbone can be traced/exported: pixels -> last_hidden_state."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model(pixel_values=pixel_values, return_dict=False)[0]
+
+
+class EagerBackend:
+    """The HuggingFace model as-is, float32, under inference_mode."""
+
+    name = "eager"
+
+    def __init__(self, model):
+        self.module = _HiddenStates(model).eval()
+
+    def __call__(self, pixel_values):
+        with torch.inference_mode():
+            return self.module(pixel_values)
+
+
+class BF16Backend(EagerBackend):
+    """Eager model with bfloat16 autocast on CPU; outputs are cast back to float32."""
+
+    name = "bf16"
+
+    def __call__(self, pixel_values):
+        with torch.inference_mode(), torch.autocast("cpu", dtype=torch.bfloat16):
+            return self.module(pixel_values).float()
+
+
+class DynamicInt8Backend(EagerBackend):
+    """Linear layers dynamically quantized to int8 (weights int8, activations quantized per batch)."""
+
+    name = "int8"
+
+    def __init__(self, model):
+        quantized = torch.ao.quantization.quantize_dynamic(
+            copy.deepcopy(model).eval(), {torch.nn.Linear}, dtype=torch.qint8
+        )
+        super().__init__(quantized)
+
+
+class TorchScriptBackend:
+    """Backbone traced to TorchScript and frozen for inference."""
+
+    name = "torchscript"
+
+    def __init__(self, model):
+        example = torch.zeros(1, 3, IMAGE_SIZE, IMAGE_SIZE)
+        with torch.inference_mode():
+            traced = torch.jit.trace(_HiddenStates(model).eval(), example)
+        self.module = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+
+    def __call__(self, pixel_values):
+        with torch.inference_mode():
+            return self.module(pixel_values)
+
+
+class ONNXBackend:
+    """Backbone exported to ONNX and run with onnxruntime (optional dependency)."""
+
+    name = "onnx"
+
+    def __init__(self, model, export_path=None):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise RuntimeError("The onnx backend requires the onnxruntime package") from e
+
+        # Without an export_path the model goes to a scratch directory that is
+        # removed once onnxruntime has loaded it, so worker starts leave nothing in /tmp
+        scratch_dir = None
+        if export_path is None:
+            scratch_dir = tempfile.mkdtemp(prefix="leafguard_onnx_")
+            export_path = os.path.join(scratch_dir, "dinov2.onnx")
+        try:
+            example = torch.zeros(1, 3, IMAGE_SIZE, IMAGE_SIZE)
+            torch.onnx.export(
+                _HiddenStates(model).eval(), (example,), export_path,
+                input_names=["pixel_values"], output_names=["last_hidden_state"],
+                dynamic_axes={"pixel_values": {0: "batch"}, "last_hidden_state": {0: "batch"}},
+                opset_version=17,
+            )
+            options = onnxruntime.SessionOptions()
+            if INTRA_OP_THREADS:
+                options.intra_op_num_threads = INTRA_OP_THREADS
+            self.session = onnxruntime.InferenceSession(export_path, options, providers=["CPUExecutionProvider"])
+        finally:
+            if scratch_dir is not None:
+                shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    def __call__(self, pixel_values):
+        outputs = self.session.run(None, {"pixel_values": pixel_values.numpy()})
+        return torch.from_numpy(outputs[0])
+
+
+BACKENDS = {cls.name: cls for cls in (EagerBackend, BF16Backend, DynamicInt8Backend, TorchScriptBackend, ONNXBackend)}
+
+
+def embedding_parity(reference, candidate, pixel_values):
+    """Minimum per-image cosine similarity between the two backends' mean-pooled embeddings."""
+    expected = reference(pixel_values).mean(dim=1)
+    actual = candidate(pixel_values).mean(dim=1)
+    return torch.nn.functional.cosine_similarity(expected, actual, dim=1).min().item()
+
+
+def create_backend(model, name=BACKEND):
+    """
+    Build the requested backend around ``model``. Non-eager backends must
+    reproduce the eager embeddings (cosine >= PARITY_THRESHOLD) on a random
+    batch, otherwise the eager backend is used instead.
+    """
+    if INTRA_OP_THREADS:
+        torch.set_num_threads(INTRA_OP_THREADS)
+    eager = EagerBackend(model)
+    if name == "eager":
+        return eager
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {name}")
+
+    try:
+        backend = BACKENDS[name](model)
+        sample = torch.randn(2, 3, IMAGE_SIZE, IMAGE_SIZE, generator=torch.Generator().manual_seed(0))
+        similarity = embedding_parity(eager, backend, sample)
+    except Exception as e:
+        print(f"[backend] {name} unavailable ({e}); using eager")
+        return eager
+    if similarity < PARITY_THRESHOLD:
+        print(f"[backend] {name} failed parity check (cosine {similarity:.4f} < {PARITY_THRESHOLD}); using eager")
+        return eager
+    print(f"[backend] using {name} (cosine vs eager {similarity:.4f})")
+    return backend
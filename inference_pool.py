@@ -0,0 +1,107 @@
+# src/inference_pool.py
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Pool sizing, overridable per deployment
+INFERENCE_WORKERS = int(os.environ.get("LEAFGUARD_INFERENCE_WORKERS", "2"))
+INFERENCE_MAX_QUEUE = int(os.environ.get("LEAFGUARD_INFERENCE_MAX_QUEUE", "8"))
+INFERENCE_EXECUTOR = os.environ.get("LEAFGUARD_INFERENCE_EXECUTOR", "thread")
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the inference pool cannot accept more work."""
+
+
+class BoundedExecutor:
+    """
+    Thread or process pool that admits at most ``max_workers + max_queue``
+    jobs at a time. Submissions beyond that fail immediately with
+    QueueFullError instead of piling up behind slow images.
+    """
+
+    def __init__(self, max_workers: int = INFERENCE_WORKERS, max_queue: int = INFERENCE_MAX_QUEUE,
+                 kind: str = INFERENCE_EXECUTOR):
+        if kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        elif kind == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                                thread_name_prefix="leafguard-inference")
+        else:
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def is_saturated(self) -> bool:
+        """True when a new submission would be rejected."""
+        with self._lock:
+            return self._in_flight >= self.capacity
+
+    def reserve(self):
+        """
+        Take one slot for a job made of several sequential steps (run each
+        with run_reserved(), then call release()). Raises QueueFullError if
+        the pool is full.
+        """
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self._rejected += 1
+                raise QueueFullError("Inference queue is full")
+            self._in_flight += 1
+
+    def release(self):
+        """Give back a slot taken with reserve()."""
+        self._release()
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule ``fn`` on the pool, or raise QueueFullError if it is full."""
+        self.reserve()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Awaitable wrapper around submit() for use inside async handlers."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    async def run_reserved(self, fn, *args, **kwargs):
+        """run() for one step of a job that already holds a slot from reserve()."""
+        return await asyncio.wrap_future(self._executor.submit(fn, *args, **kwargs))
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def stats(self) -> dict:
+        """Current pool occupancy for health and metrics reporting."""
+        with self._lock:
+            in_flight = self._in_flight
+            rejected = self._rejected
+        return {
+            "executor": self.kind,
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": in_flight,
+            "queue_depth": max(0, in_flight - self.max_workers),
+            "rejected": rejected,
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+# Global inference pool instance
+inference_pool = BoundedExecutor()
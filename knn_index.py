@@ -0,0 +1,324 @@
+# src/knn_index.py
+import json
+import os
+import shutil
+import numpy as np
+
+INDEX_META = "index.json"
+# Queries per distance-matrix block, bounds the [block, M] temporary
+QUERY_BLOCK = 1024
+# Reference rows decoded at a time by QuantizedIndex
+ROW_BLOCK = 8192
+
+
+def squared_distances(queries, vectors, vector_norms=None):
+    """[N, M] squared euclidean distances computed as one matrix product."""
+    if vector_norms is None:
+        vector_norms = np.einsum("ij,ij->i", vectors, vectors)
+    query_norms = np.einsum("ij,ij->i", queries, queries)
+    d2 = query_norms[:, None] - 2.0 * (queries @ vectors.T) + vector_norms[None, :]
+    return np.maximum(d2, 0.0, out=d2)
+
+
+def _row_norms(vectors):
+    """Squared L2 norm of each row, computed in blocks to bound temporaries."""
+    norms = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), ROW_BLOCK):
+        block = np.asarray(vectors[start:start + ROW_BLOCK], dtype=np.float32)
+        norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+    return norms
+
+
+def _top_k(d2, k):
+    """Indices and squared distances of the k smallest entries per row, ascending."""
+    k = min(k, d2.shape[1])
+    if k < d2.shape[1]:
+        part = np.argpartition(d2, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(d2.shape[1]), d2.shape).copy()
+    part_d2 = np.take_along_axis(d2, part, axis=1)
+    order = np.argsort(part_d2, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_d2, order, axis=1)
+
+
+class BruteForceIndex:
+    """Exact euclidean nearest-neighbour search over every reference vector."""
+
+    kind = "brute"
+
+    def __init__(self, vectors, norms=None):
+        # float32 C-contiguous inputs (including read-only memmaps) are used without copying
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.norms = _row_norms(self.vectors) if norms is None else norms
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    def search(self, queries, k):
+        """Return (distances, indices), both [N, k], nearest first."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if len(queries) <= QUERY_BLOCK:
+            indices, top_d2 = _top_k(squared_distances(queries, self.vectors, self.norms), k)
+            return np.sqrt(top_d2), indices
+        blocks = [self.search(queries[i:i + QUERY_BLOCK], k) for i in range(0, len(queries), QUERY_BLOCK)]
+        return np.concatenate([d for d, _ in blocks]), np.concatenate([i for _, i in blocks])
+
+    def params(self):
+        return {}
+
+    def arrays(self):
+        return {"vectors": self.vectors, "norms": self.norms}
+
+    @classmethod
+    def from_arrays(cls, arrays, params):
+        return cls(arrays["vectors"], arrays.get("norms"))
+
+
+class IVFIndex:
+    """
+    Inverted-file index: vectors are bucketed by their nearest k-means
+    centroid and a query only scans the ``n_probe`` closest buckets.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, centroids, vectors, ids, offsets, n_probe=8, norms=None):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)  # grouped by list
+        self.ids = np.asarray(ids)  # original row of each grouped vector
+        self.offsets = np.asarray(offsets)  # list i spans offsets[i]:offsets[i + 1]
+        self.norms = _row_norms(self.vectors) if norms is None else norms
+        self.n_probe = n_probe
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    @classmethod
+    def build(cls, vectors, n_lists=None, n_probe=8, iterations=20, sample_size=None, seed=0):
+        """Train k-means centroids on a sample and bucket every vector."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+        rng = np.random.default_rng(seed)
+
+        sample_size = sample_size or min(len(vectors), 256 * n_lists)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = squared_distances(sample, centroids).argmin(axis=1)
+            for c in range(n_lists):
+                members = sample[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+
+        assignment = np.concatenate([
+            squared_distances(vectors[i:i + 4096], centroids).argmin(axis=1)
+            for i in range(0, len(vectors), 4096)
+        ])
+        ids = np.argsort(assignment, kind="stable")
+        offsets = np.searchsorted(assignment[ids], np.arange(n_lists + 1))
+        return cls(centroids, vectors[ids], ids, offsets, n_probe=n_probe)
+
+    def search(self, queries, k):
+        """Return approximate (distances, indices), both [N, k], nearest first."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, len(self.vectors))
+        list_order = np.argsort(squared_distances(queries, self.centroids), axis=1)
+        list_sizes = np.diff(self.offsets)
+
+        distances = np.empty((len(queries), k), dtype=np.float32)
+        indices = np.empty((len(queries), k), dtype=np.int64)
+        for q, lists in enumerate(list_order):
+            # Probe n_probe lists, plus more if they hold fewer than k vectors
+            n_probe = max(self.n_probe, int(np.searchsorted(np.cumsum(list_sizes[lists]), k)) + 1)
+            rows = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in lists[:n_probe]])
+            d2 = squared_distances(queries[q:q + 1], self.vectors[rows], self.norms[rows])
+            top, top_d2 = _top_k(d2, k)
+            distances[q] = np.sqrt(top_d2[0])
+            indices[q] = self.ids[rows[top[0]]]
+        return distances, indices
+
+    def params(self):
+        return {"n_probe": self.n_probe}
+
+    def arrays(self):
+        return {"centroids": self.centroids, "vectors": self.vectors, "ids": self.ids,
+                "offsets": self.offsets, "norms": self.norms}
+
+    @classmethod
+    def from_arrays(cls, arrays, params):
+        return cls(arrays["centroids"], arrays["vectors"], arrays["ids"], arrays["offsets"],
+                   norms=arrays.get("norms"), **params)
+
+
+class QuantizedIndex:
+    """
+    Exhaustive search over compactly stored vectors: float16, or int8 with a
+    per-dimension offset and scale. Rows are decoded block by block while
+    scanning, so only the compact codes stay resident. When ``exact`` float32
+    vectors are supplied and ``rerank`` > 0, the best ``k * rerank``
+    candidates are re-scored exactly.
+    """
+
+    kind = "quantized"
+
+    def __init__(self, codes, norms, offset=None, scale=None, exact=None, rerank=0):
+        self.codes = codes
+        self.norms = np.asarray(norms, dtype=np.float32)  # of the decoded vectors
+        self.offset = offset
+        self.scale = scale
+        self.exact = exact
+        self.rerank = rerank
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def dim(self):
+        return self.codes.shape[1]
+
+    @property
+    def storage(self):
+        return "int8" if self.codes.dtype == np.int8 else "float16"
+
+    @classmethod
+    def build(cls, vectors, storage="int8", **kwargs):
+        """Quantize [N, D] float vectors to ``storage`` ("float16" or "int8")."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if storage == "float16":
+            codes, offset, scale = vectors.astype(np.float16), None, None
+        elif storage == "int8":
+            offset = vectors.min(axis=0)
+            scale = (vectors.max(axis=0) - offset) / 255.0
+            scale[scale == 0] = 1.0
+            codes = (np.rint((vectors - offset) / scale) - 128).astype(np.int8)
+        else:
+            raise ValueError(f"Unknown storage: {storage}")
+        index = cls(codes, np.zeros(len(codes), dtype=np.float32), offset, scale, **kwargs)
+        for start in range(0, len(codes), ROW_BLOCK):
+            block = index._decode(start, start + ROW_BLOCK)
+            index.norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+        return index
+
+    def _decode(self, start, stop):
+        block = self.codes[start:stop].astype(np.float32)
+        if self.scale is not None:
+            block += 128.0
+            block *= self.scale
+            block += self.offset
+        return block
+
+    def search(self, queries, k):
+        """Return (distances, indices), both [N, k], nearest first."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if len(queries) > QUERY_BLOCK:
+            blocks = [self.search(queries[i:i + QUERY_BLOCK], k) for i in range(0, len(queries), QUERY_BLOCK)]
+            return np.concatenate([d for d, _ in blocks]), np.concatenate([i for _, i in blocks])
+
+        d2 = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), ROW_BLOCK):
+            stop = min(start + ROW_BLOCK, len(self.codes))
+            d2[:, start:stop] = squared_distances(queries, self._decode(start, stop), self.norms[start:stop])
+
+        if not self.rerank or self.exact is None:
+            indices, top_d2 = _top_k(d2, k)
+            return np.sqrt(top_d2), indices
+
+        candidates, _ = _top_k(d2, k * self.rerank)
+        distances = np.empty((len(queries), min(k, candidates.shape[1])), dtype=np.float32)
+        indices = np.empty(distances.shape, dtype=np.int64)
+        for q, rows in enumerate(np.sort(candidates, axis=1)):
+            # Sorted rows keep reads from a memory-mapped ``exact`` sequential
+            exact_d2 = squared_distances(queries[q:q + 1], np.asarray(self.exact[rows], dtype=np.float32))
+            top, top_d2 = _top_k(exact_d2, k)
+            distances[q] = np.sqrt(top_d2[0])
+            indices[q] = rows[top[0]]
+        return distances, indices
+
+    def params(self):
+        return {"rerank": self.rerank}
+
+    def arrays(self):
+        arrays = {"codes": self.codes, "norms": self.norms}
+        if self.scale is not None:
+            arrays.update(offset=self.offset, scale=self.scale)
+        return arrays
+
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays().values())
+
+    @classmethod
+    def from_arrays(cls, arrays, params):
+        return cls(arrays["codes"], arrays["norms"], arrays.get("offset"), arrays.get("scale"), **params)
+
+
+INDEX_TYPES = {cls.kind: cls for cls in (BruteForceIndex, IVFIndex, QuantizedIndex)}
+
+
+def build_index(vectors, kind="brute", **params):
+    """
+    Build an index of the given kind over [N, D] reference vectors:
+    "brute", "ivf", or a quantized "float16" / "int8" exhaustive index.
+    """
+    if kind == "brute":
+        return BruteForceIndex(vectors)
+    if kind == "ivf":
+        return IVFIndex.build(vectors, **params)
+    if kind in ("float16", "int8"):
+        return QuantizedIndex.build(vectors, storage=kind, **params)
+    raise ValueError(f"Unknown index kind: {kind}")
+
+
+def save_index(index, directory):
+    """
+    Persist an index as one .npy file per array plus index.json metadata.
+
+    The files are written into a sibling directory that is then renamed into
+    place, so workers that memory-mapped the previous index keep reading its
+    (now unlinked) files instead of seeing them truncated and rewritten.
+    """
+    tmp_dir = f"{directory}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, array in index.arrays().items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+    with open(os.path.join(tmp_dir, INDEX_META), "w") as f:
+        json.dump({"kind": index.kind, "params": index.params(), "size": len(index)}, f)
+
+    old_dir = f"{directory}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(directory):
+        os.rename(directory, old_dir)
+    os.rename(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def index_size(directory):
+    """Number of vectors in a saved index, read from its metadata only."""
+    with open(os.path.join(directory, INDEX_META)) as f:
+        return json.load(f)["size"]
+
+
+def load_index(directory, mmap_mode="r", **overrides):
+    """
+    Load an index written by save_index(); ``overrides`` replace stored params.
+
+    Arrays are memory-mapped read-only by default, so every worker process
+    shares one page-cache copy and loading does not read the data up front.
+    Pass ``mmap_mode=None`` to load private in-memory copies instead.
+    """
+    with open(os.path.join(directory, INDEX_META)) as f:
+        meta = json.load(f)
+    cls = INDEX_TYPES[meta["kind"]]
+    names = [f[:-4] for f in os.listdir(directory) if f.endswith(".npy")]
+    arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in names}
+    return cls.from_arrays(arrays, {**meta["params"], **overrides})
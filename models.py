@@ -1,23 +1,163 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime
+from sqlalchemy import create_engine, event, inspect, select, text, false, Column, Integer, String, Float, Boolean, Date, DateTime, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from contextlib import contextmanager
 import datetime
+import os
 
-DATABASE_URL = "sqlite:///./results.db"
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./results.db")
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+# Optional async engine for the async endpoints; needs an async driver (aiosqlite / asyncpg)
+ASYNC_DB_ENABLED = os.environ.get("LEAFGUARD_ASYNC_DB", "0") == "1"
+ASYNC_DATABASE_URL = os.environ.get("LEAFGUARD_ASYNC_DATABASE_URL") or (
+    DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1) if IS_SQLITE
+    else DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+)
+
+# Connection pool sizing (ignored by SQLite's in-memory databases)
+DB_POOL_SIZE = int(os.environ.get("LEAFGUARD_DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("LEAFGUARD_DB_MAX_OVERFLOW", "10"))
+
+# In-memory SQLite uses a single shared connection, so pool sizing does not apply.
+# QueuePool is named explicitly: older SQLAlchemy defaults file SQLite to NullPool,
+# which rejects the sizing arguments
+pool_args = {} if DATABASE_URL in ("sqlite://", "sqlite:///:memory:") else {
+    "poolclass": QueuePool,
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_pre_ping": True,
+}
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    **pool_args
+)
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",      # readers no longer block the writer
+    "PRAGMA synchronous=NORMAL",    # fsync at checkpoints only; safe with WAL
+    "PRAGMA busy_timeout=30000",    # wait for the write lock instead of failing
+    "PRAGMA cache_size=-16000",     # 16 MB page cache per connection
+    "PRAGMA temp_store=MEMORY",
+)
+
+if IS_SQLITE:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 class UserResult(Base):
     __tablename__ = "user_results"
     id = Column(Integer, primary_key=True, index=True)
-    image_path = Column(String, nullable=False)
+    image_path = Column(String, nullable=False)  # original upload filename
+    image_hash = Column(String, nullable=True)  # SHA-256 of the uploaded bytes
     prediction = Column(String, nullable=False)
     confidence = Column(Float, nullable=True)
     severity = Column(Float, nullable=True)
     report_path = Column(String, nullable=False)
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
+    # Set once the row is counted in the rollup tables (see src.stats)
+    rolled_up = Column(Boolean, nullable=False, default=False, server_default=false())
+
+    # Filters in /results/ narrow on one column and page by id
+    __table_args__ = (
+        Index("ix_user_results_prediction_id", "prediction", "id"),
+        Index("ix_user_results_timestamp", "timestamp"),
+        Index("ix_user_results_severity", "severity"),
+        # Only the few rows still waiting for the rollups are indexed
+        Index("ix_user_results_pending_rollup", "id",
+              sqlite_where=rolled_up == false(), postgresql_where=rolled_up == false()),
+    )
+
+class DailyResultStats(Base):
+    """Per-day, per-disease rollup of UserResult rows (maintained by src.stats)."""
+    __tablename__ = "daily_result_stats"
+    day = Column(Date, primary_key=True)
+    prediction = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    severity_sum = Column(Float, nullable=False, default=0.0)
+    severity_count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    confidence_count = Column(Integer, nullable=False, default=0)
+
+class ResultHistogram(Base):
+    """Per-day, per-disease severity / confidence histogram buckets (maintained by src.stats)."""
+    __tablename__ = "result_histograms"
+    day = Column(Date, primary_key=True)
+    prediction = Column(String, primary_key=True)
+    metric = Column(String, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class RollupState(Base):
+    """
+    Rollup bookkeeping row; folders lock it so only one counts at a time.
+    last_result_id is the highest UserResult id folded so far.
+    """
+    __tablename__ = "rollup_state"
+    name = Column(String, primary_key=True)
+    last_result_id = Column(Integer, nullable=False, default=0)
+
+# Create the tables
+Base.metadata.create_all(bind=engine)
+# Databases created before the rolled_up flag: add it and mark the rows the
+# old id watermark already counted
+if "rolled_up" not in {c["name"] for c in inspect(engine).get_columns(UserResult.__tablename__)}:
+    with engine.begin() as _conn:
+        _conn.execute(text(
+            "ALTER TABLE user_results ADD COLUMN rolled_up BOOLEAN NOT NULL DEFAULT "
+            + ("0" if IS_SQLITE else "false")
+        ))
+        _conn.execute(
+            UserResult.__table__.update()
+            .where(UserResult.id <= select(RollupState.last_result_id)
+                   .where(RollupState.name == "user_results").scalar_subquery())
+            .values(rolled_up=True)
+        )
+# Databases created before results recorded the upload's content hash
+if "image_hash" not in {c["name"] for c in inspect(engine).get_columns(UserResult.__tablename__)}:
+    with engine.begin() as _conn:
+        _conn.execute(text("ALTER TABLE user_results ADD COLUMN image_hash VARCHAR"))
+# create_all skips indexes of tables that already exist; add any that are missing
+for _index in UserResult.__table__.indexes:
+    _index.create(bind=engine, checkfirst=True)
+
+@contextmanager
+def session_scope():
+    """Transactional session: commits on success, rolls back on error, always closes."""
+    session = SessionLocal()
+    try:
+        yield session
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+_async_engine = None
+_async_session_factory = None
 
-# Create the table
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+def get_async_sessionmaker():
+    """
+    Session factory bound to an async engine on the same database
+    (ASYNC_DATABASE_URL). Created on first use; requires the async driver.
+    """
+    global _async_engine, _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        try:
+            _async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True)
+        except ModuleNotFoundError as e:
+            raise RuntimeError(f"Async database access needs the driver for {ASYNC_DATABASE_URL}: {e}") from e
+        if IS_SQLITE:
+            event.listen(_async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        _async_session_factory = async_sessionmaker(_async_engine, expire_on_commit=False)
+    return _async_session_factory
@@ -0,0 +1,182 @@
+# src/persistence.py
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+from sqlalchemy import insert
+from src.models import UserResult, session_scope
+from src.stats import fold_new_results
+
+# Write-behind batching of result inserts
+RESULT_FLUSH_ROWS = int(os.environ.get("LEAFGUARD_RESULT_FLUSH_ROWS", "32"))
+RESULT_FLUSH_MS = float(os.environ.get("LEAFGUARD_RESULT_FLUSH_MS", "200"))
+# Failed flushes are retried with exponential backoff before rows are given up on
+RESULT_WRITE_RETRIES = int(os.environ.get("LEAFGUARD_RESULT_WRITE_RETRIES", "5"))
+RESULT_RETRY_BACKOFF_MS = float(os.environ.get("LEAFGUARD_RESULT_RETRY_BACKOFF_MS", "100"))
+# Rows that still cannot be stored are appended here and replayed on the next start
+RESULT_SPOOL_PATH = os.environ.get("LEAFGUARD_RESULT_SPOOL", "data/unsaved_results.jsonl")
+
+
+class ResultWriter:
+    """
+    Write-behind buffer for UserResult rows. Requests hand their row to
+    submit() and return immediately; a background thread inserts queued rows
+    in one transaction per group of up to ``flush_rows`` rows, or every
+    ``flush_ms`` milliseconds, so concurrent requests do not take turns on
+    the database write lock.
+
+    Requests have already been answered when their rows are written, so a
+    failed flush is retried with backoff; if it keeps failing the rows are
+    stored one by one, and any that still fail are spooled to
+    ``spool_path`` for replay_spool() instead of being dropped.
+    """
+
+    def __init__(self, flush_rows: int = RESULT_FLUSH_ROWS, flush_ms: float = RESULT_FLUSH_MS,
+                 retries: int = RESULT_WRITE_RETRIES, backoff_ms: float = RESULT_RETRY_BACKOFF_MS,
+                 spool_path: str = RESULT_SPOOL_PATH):
+        self.flush_rows = flush_rows
+        self.flush_ms = flush_ms
+        self.retries = retries
+        self.backoff_ms = backoff_ms
+        self.spool_path = spool_path
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.rows_written = 0
+        self.flushes = 0
+        self.failed_rows = 0
+        self.retried_flushes = 0
+        self.spooled_rows = 0
+
+    def submit(self, **row):
+        """Queue one UserResult row (column name -> value) for insertion."""
+        self._ensure_started()
+        # Stamp now rather than at flush time
+        row.setdefault("timestamp", datetime.datetime.utcnow())
+        self._queue.put(row)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="leafguard-result-writer", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        try:
+            rows = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.perf_counter() + self.flush_ms / 1000.0
+        while len(rows) < self.flush_rows:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                rows.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return rows
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            rows = self._collect()
+            if rows:
+                self._write(rows)
+
+    def _insert(self, rows):
+        with session_scope() as session:
+            ids = session.execute(insert(UserResult).returning(UserResult.id), rows).scalars().all()
+            # Rollups move in the same transaction as the rows they count. Only these rows are
+            # folded; older unflagged rows (e.g. from before the rollups existed) are left to
+            # refresh_rollups(), so a flush never grows into a backfill of the whole table
+            fold_new_results(session, ids=ids)
+
+    def _write(self, rows):
+        for attempt in range(self.retries + 1):
+            try:
+                self._insert(rows)
+                self.rows_written += len(rows)
+                self.flushes += 1
+                return
+            except Exception as e:
+                error = e
+                if attempt < self.retries:
+                    self.retried_flushes += 1
+                    time.sleep(self.backoff_ms * 2 ** attempt / 1000.0)
+        print(f"LeafGuard AI failed to store {len(rows)} results after {self.retries + 1} attempts: {error}")
+
+        # One bad row (e.g. a constraint violation) must not take the rest of the group with it
+        unsaved = rows
+        if len(rows) > 1:
+            unsaved = []
+            for row in rows:
+                try:
+                    self._insert([row])
+                    self.rows_written += 1
+                except Exception:
+                    unsaved.append(row)
+            self.flushes += 1
+        self.failed_rows += len(unsaved)
+        self._spool(unsaved)
+
+    def _spool(self, rows):
+        if not rows:
+            return
+        try:
+            directory = os.path.dirname(self.spool_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.spool_path, "a") as f:
+                for row in rows:
+                    f.write(json.dumps(row, default=datetime.datetime.isoformat) + "\n")
+            self.spooled_rows += len(rows)
+            print(f"LeafGuard AI spooled {len(rows)} unsaved results to {self.spool_path}")
+        except Exception as e:
+            print(f"LeafGuard AI lost {len(rows)} results, spooling failed: {e}")
+
+    def replay_spool(self) -> int:
+        """Queue rows spooled by earlier failed flushes for another attempt; returns how many."""
+        if not os.path.exists(self.spool_path):
+            return 0
+        replay_path = f"{self.spool_path}.replay"
+        os.replace(self.spool_path, replay_path)
+        count = 0
+        with open(replay_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if row.get("timestamp"):
+                    row["timestamp"] = datetime.datetime.fromisoformat(row["timestamp"])
+                self.submit(**row)
+                count += 1
+        os.remove(replay_path)
+        return count
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending(),
+            "rows_written": self.rows_written,
+            "flushes": self.flushes,
+            "failed_rows": self.failed_rows,
+            "retried_flushes": self.retried_flushes,
+            "spooled_rows": self.spooled_rows,
+        }
+
+    def close(self, timeout: float = 10.0):
+        """Flush everything still queued and stop the writer thread."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+# Global result writer instance
+result_writer = ResultWriter()
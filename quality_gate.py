@@ -0,0 +1,89 @@
+# src/quality_gate.py
+import os
+import threading
+import time
+from src.image_enhancement import image_enhancer
+
+# Pre-inference quality gate; set LEAFGUARD_QUALITY_GATE=0 to disable
+QUALITY_GATE_ENABLED = os.environ.get("LEAFGUARD_QUALITY_GATE", "1") != "0"
+# Rejection thresholds, on the metrics of ImageEnhancer.quick_quality(). They
+# only catch clearly unusable frames (black, blown out, flat, heavily blurred);
+# borderline photos still get analysed along with their recommendations.
+GATE_MIN_BRIGHTNESS = float(os.environ.get("LEAFGUARD_GATE_MIN_BRIGHTNESS", "10"))
+GATE_MAX_BRIGHTNESS = float(os.environ.get("LEAFGUARD_GATE_MAX_BRIGHTNESS", "250"))
+GATE_MIN_CONTRAST = float(os.environ.get("LEAFGUARD_GATE_MIN_CONTRAST", "2"))
+GATE_MIN_SHARPNESS = float(os.environ.get("LEAFGUARD_GATE_MIN_SHARPNESS", "2"))
+GATE_MIN_SIDE = int(os.environ.get("LEAFGUARD_GATE_MIN_SIDE", "64"))
+
+
+class QualityGate:
+    """
+    Cheap check run on each upload before the model. check() returns the
+    reasons an image is unusable (empty if it may proceed) together with
+    its quick quality report; stats() estimates the pipeline time saved by
+    rejections from the average duration of the analyses that did run.
+    """
+
+    def __init__(self, enabled: bool = QUALITY_GATE_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.rejected = 0
+        self.gate_seconds = 0.0
+        self.pipeline_runs = 0
+        self.pipeline_seconds = 0.0
+
+    def check(self, image):
+        """(reasons, quality report) for an image path, PIL image or RGB array."""
+        if not self.enabled:
+            return [], None
+        start = time.perf_counter()
+        report = image_enhancer.quick_quality(image)
+        reasons = self._reasons(report)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.checked += 1
+            self.gate_seconds += elapsed
+            if reasons:
+                self.rejected += 1
+        return reasons, report
+
+    @staticmethod
+    def _reasons(report):
+        if "error" in report:
+            return [report["error"]]
+        reasons = []
+        width, height = (int(v) for v in report["dimensions"].split("x"))
+        if min(width, height) < GATE_MIN_SIDE:
+            reasons.append(f"Image is too small ({report['dimensions']})")
+        if report["brightness"] < GATE_MIN_BRIGHTNESS:
+            reasons.append("Image is almost completely dark")
+        elif report["brightness"] > GATE_MAX_BRIGHTNESS:
+            reasons.append("Image is almost completely overexposed")
+        if report["contrast"] < GATE_MIN_CONTRAST:
+            reasons.append("Image has almost no detail (flat frame)")
+        elif report["sharpness"] < GATE_MIN_SHARPNESS:
+            reasons.append("Image is too blurry to analyse")
+        return reasons
+
+    def record_pipeline(self, seconds: float):
+        """Duration of one analysis that passed the gate, for the savings estimate."""
+        with self._lock:
+            self.pipeline_runs += 1
+            self.pipeline_seconds += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            average_pipeline_ms = self.pipeline_seconds / self.pipeline_runs * 1000 if self.pipeline_runs else 0.0
+            return {
+                "enabled": self.enabled,
+                "checked": self.checked,
+                "rejected": self.rejected,
+                "average_gate_ms": round(self.gate_seconds / self.checked * 1000, 2) if self.checked else 0.0,
+                "average_pipeline_ms": round(average_pipeline_ms, 1),
+                "estimated_saved_ms": round(self.rejected * average_pipeline_ms, 1),
+            }
+
+
+# Global quality gate instance
+quality_gate = QualityGate()
@@ -0,0 +1,37 @@
+# src/report_cache.py
+import hashlib
+import os
+from src.tiered_cache import TieredCache
+
+# In-memory tier size cap for finished PDFs; 0 disables the cache entirely
+REPORT_CACHE_MB = float(os.environ.get("LEAFGUARD_REPORT_CACHE_MB", "32"))
+# Optional on-disk tier shared by every worker on the machine
+REPORT_CACHE_DIR = os.environ.get("LEAFGUARD_REPORT_CACHE_DIR") or None
+
+
+def report_key(image_bytes: bytes, heatmap_bytes, prediction: str, severity) -> str:
+    """Key of a finished report: the analysed image and heatmap contents plus everything printed about them."""
+    digest = hashlib.sha256(image_bytes)
+    digest.update(hashlib.sha256(heatmap_bytes or b"").digest())
+    digest.update(f"\0{prediction}\0{severity}".encode())
+    return digest.hexdigest()
+
+
+class ReportCache(TieredCache):
+    """Size-capped LRU of rendered PDF bytes with an optional on-disk second tier."""
+
+    suffix = ".pdf"
+
+    def _size(self, report) -> int:
+        return len(report)
+
+    def _load(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def _dump(self, f, report):
+        f.write(report)
+
+
+# Global report cache instance
+report_cache = ReportCache(int(REPORT_CACHE_MB * 1024 * 1024), REPORT_CACHE_DIR)
@@ -0,0 +1,205 @@
+# src/stats.py
+import datetime
+from collections import Counter, defaultdict
+from sqlalchemy import false, func, select, true, update
+from src.models import UserResult, DailyResultStats, ResultHistogram, RollupState, IS_SQLITE, session_scope
+
+# Histogram bucket layout: (lowest value, bucket width, number of buckets)
+HISTOGRAMS = {
+    "severity": (0.0, 10.0, 10),      # percent
+    "confidence": (0.0, 0.1, 10),     # fraction of neighbour votes
+}
+ROLLUP_NAME = "user_results"
+REFRESH_BATCH_SIZE = 10000
+# Ids per UPDATE when flagging folded rows (keeps under SQLite's variable limit)
+FLAG_BATCH_SIZE = 500
+
+
+def bucket_index(metric: str, value: float) -> int:
+    low, width, count = HISTOGRAMS[metric]
+    return min(max(int((value - low) // width), 0), count - 1)
+
+
+def bucket_bounds(metric: str):
+    low, width, count = HISTOGRAMS[metric]
+    return [[round(low + i * width, 6), round(low + (i + 1) * width, 6)] for i in range(count)]
+
+
+def _aggregate(rows):
+    """Fold (timestamp, prediction, severity, confidence) rows into daily totals and histogram counts."""
+    daily = defaultdict(Counter)
+    histograms = Counter()
+    for timestamp, prediction, severity, confidence in rows:
+        day = (timestamp or datetime.datetime.utcnow()).date()
+        totals = daily[(day, prediction)]
+        totals["count"] += 1
+        for metric, value in (("severity", severity), ("confidence", confidence)):
+            if value is None:
+                continue
+            totals[f"{metric}_sum"] += value
+            totals[f"{metric}_count"] += 1
+            histograms[(day, prediction, metric, bucket_index(metric, value))] += 1
+    return daily, histograms
+
+
+def _upsert_insert(table):
+    if IS_SQLITE:
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(table)
+
+
+def _increment(session, model, keys, rows):
+    """Add ``rows`` (key columns + deltas) onto the existing rollup rows in one statement."""
+    if not rows:
+        return
+    table = model.__table__
+    stmt = _upsert_insert(table)
+    deltas = [c for c in rows[0] if c not in keys]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={c: table.c[c] + stmt.excluded[c] for c in deltas},
+    )
+    session.execute(stmt, rows)
+
+
+def _lock_rollup_state(session) -> RollupState:
+    """
+    Return the rollup state row locked for this transaction, creating it
+    first if needed. ON CONFLICT DO NOTHING lets two first-run writers both
+    create it without a unique violation; the row lock then serialises them.
+    """
+    session.execute(
+        _upsert_insert(RollupState.__table__)
+        .values(name=ROLLUP_NAME, last_result_id=0)
+        .on_conflict_do_nothing(index_elements=["name"])
+    )
+    return session.execute(
+        select(RollupState).where(RollupState.name == ROLLUP_NAME).with_for_update()
+    ).scalar_one()
+
+
+def fold_new_results(session, limit: int = None, ids=None) -> int:
+    """
+    Fold UserResult rows not yet rolled up into the rollup tables and flag
+    them, all inside ``session``'s transaction. Called by the result writer
+    in the same transaction as its inserts, with the ``ids`` it just
+    inserted, so the rollups never drift from the table. Rows are picked by
+    their rolled_up flag rather than an id watermark: concurrent writers can
+    commit ids out of order, and a watermark would skip the lower ids
+    committed late. Returns the number of rows folded.
+    """
+    if ids is not None and len(ids) == 0:
+        return 0
+    state = _lock_rollup_state(session)
+    query = (
+        select(UserResult.id, UserResult.timestamp, UserResult.prediction, UserResult.severity, UserResult.confidence)
+        .where(UserResult.rolled_up == false())
+        .order_by(UserResult.id)
+    )
+    if ids is not None:
+        query = query.where(UserResult.id.in_(ids))
+    if limit is not None:
+        query = query.limit(limit)
+    rows = session.execute(query).all()
+    if not rows:
+        return 0
+
+    daily, histograms = _aggregate((r.timestamp, r.prediction, r.severity, r.confidence) for r in rows)
+    _increment(session, DailyResultStats, ["day", "prediction"], [
+        {
+            "day": day, "prediction": prediction, "count": totals["count"],
+            "severity_sum": float(totals["severity_sum"]), "severity_count": totals["severity_count"],
+            "confidence_sum": float(totals["confidence_sum"]), "confidence_count": totals["confidence_count"],
+        }
+        for (day, prediction), totals in daily.items()
+    ])
+    _increment(session, ResultHistogram, ["day", "prediction", "metric", "bucket"], [
+        {"day": day, "prediction": prediction, "metric": metric, "bucket": bucket, "count": count}
+        for (day, prediction, metric, bucket), count in histograms.items()
+    ])
+    ids = [r.id for r in rows]
+    for start in range(0, len(ids), FLAG_BATCH_SIZE):
+        session.execute(
+            update(UserResult).where(UserResult.id.in_(ids[start:start + FLAG_BATCH_SIZE])).values(rolled_up=True)
+        )
+    state.last_result_id = max(state.last_result_id, ids[-1])
+    return len(rows)
+
+
+def refresh_rollups(batch_size: int = REFRESH_BATCH_SIZE) -> int:
+    """
+    Batch refresh: fold every not-yet-rolled-up result, ``batch_size`` rows
+    per transaction. Backfills an existing database on first run.
+    """
+    total = 0
+    while True:
+        with session_scope() as session:
+            folded = fold_new_results(session, limit=batch_size)
+        total += folded
+        if folded < batch_size:
+            return total
+
+
+def rebuild_rollups() -> int:
+    """Drop the rollups and recompute them from the full UserResult table."""
+    with session_scope() as session:
+        state = _lock_rollup_state(session)
+        session.query(DailyResultStats).delete()
+        session.query(ResultHistogram).delete()
+        session.execute(update(UserResult).where(UserResult.rolled_up == true()).values(rolled_up=False))
+        state.last_result_id = 0
+    return refresh_rollups()
+
+
+def get_stats(since: datetime.date = None, until: datetime.date = None, prediction: str = None) -> dict:
+    """
+    Counts per disease per day, severity/confidence means and histograms
+    for the day range [since, until], read from the rollup tables only.
+    """
+    def in_range(query, model):
+        if since is not None:
+            query = query.where(model.day >= since)
+        if until is not None:
+            query = query.where(model.day <= until)
+        if prediction is not None:
+            query = query.where(model.prediction == prediction)
+        return query
+
+    with session_scope() as session:
+        daily_rows = session.execute(
+            in_range(select(DailyResultStats), DailyResultStats).order_by(DailyResultStats.day, DailyResultStats.prediction)
+        ).scalars().all()
+        histogram_rows = session.execute(
+            in_range(
+                select(ResultHistogram.prediction, ResultHistogram.metric, ResultHistogram.bucket,
+                       func.sum(ResultHistogram.count)),
+                ResultHistogram,
+            ).group_by(ResultHistogram.prediction, ResultHistogram.metric, ResultHistogram.bucket)
+        ).all()
+
+        daily = []
+        totals = defaultdict(Counter)
+        for r in daily_rows:
+            daily.append({
+                "day": r.day.isoformat(),
+                "prediction": r.prediction,
+                "count": r.count,
+                "mean_severity": round(r.severity_sum / r.severity_count, 4) if r.severity_count else None,
+                "mean_confidence": round(r.confidence_sum / r.confidence_count, 4) if r.confidence_count else None,
+            })
+            totals[r.prediction]["count"] += r.count
+
+    histograms = {metric: {} for metric in HISTOGRAMS}
+    for disease, metric, bucket, count in histogram_rows:
+        counts = histograms[metric].setdefault(disease, [0] * HISTOGRAMS[metric][2])
+        counts[bucket] = int(count)
+
+    return {
+        "total": sum(t["count"] for t in totals.values()),
+        "per_prediction": {disease: t["count"] for disease, t in sorted(totals.items())},
+        "daily": daily,
+        "severity_histogram": {"buckets": bucket_bounds("severity"), "counts": histograms["severity"]},
+        "confidence_histogram": {"buckets": bucket_bounds("confidence"), "counts": histograms["confidence"]},
+    }
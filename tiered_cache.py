@@ -0,0 +1,109 @@
+# src/tiered_cache.py
+import os
+import threading
+from collections import Counter, OrderedDict, defaultdict
+
+
+class TieredCache:
+    """
+    Size-capped in-memory LRU with an optional on-disk second tier shared by
+    every worker on the machine. Subclasses supply the payload handling:
+    the disk file ``suffix``, ``_size``, ``_load`` and ``_dump``. Counters
+    are kept per ``_kind(key)`` so a subclass can report entry types apart.
+    """
+
+    suffix = ""
+
+    def __init__(self, max_bytes: int, disk_dir: str = None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Per kind: hits, disk_hits, misses, entries, bytes
+        self._counts = defaultdict(Counter)
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 or self.disk_dir is not None
+
+    def _kind(self, key) -> str:
+        return "entries"
+
+    def _size(self, value) -> int:
+        raise NotImplementedError
+
+    def _load(self, path):
+        raise NotImplementedError
+
+    def _dump(self, f, value):
+        raise NotImplementedError
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}{self.suffix}")
+
+    def get(self, key):
+        """Cached value for ``key`` (memory first, then disk), or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self._counts[self._kind(key)]["hits"] += 1
+                return value
+        if self.disk_dir:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                value = self._load(path)
+                self._remember(key, value)
+                with self._lock:
+                    self._counts[self._kind(key)]["disk_hits"] += 1
+                return value
+        with self._lock:
+            self._counts[self._kind(key)]["misses"] += 1
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                self._dump(f, value)
+            os.replace(tmp_path, path)
+
+    def _track(self, key, value, sign):
+        size = self._size(value)
+        counts = self._counts[self._kind(key)]
+        counts["entries"] += sign
+        counts["bytes"] += sign * size
+        self._bytes += sign * size
+
+    def _remember(self, key, value):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._track(key, previous, -1)
+            self._entries[key] = value
+            self._track(key, value, 1)
+            while self._bytes > self.max_bytes and self._entries:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._track(evicted_key, evicted, -1)
+
+    def _summary(self, kind) -> dict:
+        counts = self._counts[kind]
+        lookups = counts["hits"] + counts["disk_hits"] + counts["misses"]
+        return {
+            "entries": counts["entries"],
+            "memory_bytes": counts["bytes"],
+            "hits": counts["hits"],
+            "disk_hits": counts["disk_hits"],
+            "misses": counts["misses"],
+            "hit_rate": round((counts["hits"] + counts["disk_hits"]) / lookups, 4) if lookups else 0.0,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._summary("entries"), max_bytes=self.max_bytes, disk_tier=self.disk_dir)
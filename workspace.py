@@ -0,0 +1,122 @@
+# src/workspace.py
+import contextvars
+import io
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+from PIL import Image
+
+# Workspace of the request being processed on the current thread / task.
+# Stages that write intermediate files (heatmap, report) resolve their default
+# output paths through it, so concurrent requests never share a file name.
+_current_workspace = contextvars.ContextVar("leafguard_workspace", default=None)
+
+
+class RequestWorkspace:
+    """Unique scratch directory for a single analysis request."""
+
+    def __init__(self, prefix: str = "leafguard_"):
+        self.root = tempfile.mkdtemp(prefix=prefix)
+        # Decoded images keyed by absolute path, shared by every pipeline stage
+        self._images = {}
+        self._arrays = {}
+        # Per-image by-products of one stage that later stages can reuse
+        self._artifacts = {}
+
+    def path(self, name: str) -> str:
+        """Return the absolute path of ``name`` inside the workspace."""
+        return os.path.join(self.root, name)
+
+    @contextmanager
+    def activate(self):
+        """Make this the current workspace for the enclosed block."""
+        token = _current_workspace.set(self)
+        try:
+            yield self
+        finally:
+            _current_workspace.reset(token)
+
+    def add_image(self, path: str, data: bytes) -> Image.Image:
+        """
+        Write the raw upload to ``path`` and decode it once to RGB. Later
+        load_image()/load_rgb_array() calls for that path reuse the decode.
+        Raises PIL.UnidentifiedImageError if the bytes are not an image.
+        """
+        image = Image.open(io.BytesIO(data)).convert("RGB")
+        with open(path, "wb") as f:
+            f.write(data)
+        self._images[os.path.abspath(path)] = image
+        return image
+
+    def cleanup(self):
+        """Remove the workspace directory and everything in it."""
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def current_workspace():
+    """Return the active RequestWorkspace, or None outside a request."""
+    return _current_workspace.get()
+
+
+def workspace_path(name: str) -> str:
+    """Resolve ``name`` inside the active workspace (cwd-relative if none)."""
+    workspace = _current_workspace.get()
+    if workspace is None:
+        return name
+    return workspace.path(name)
+
+
+def remember(source, name: str, value):
+    """Attach ``value`` to the image at path ``source`` for the rest of the request."""
+    workspace = _current_workspace.get()
+    if workspace is not None and isinstance(source, str):
+        workspace._artifacts[(os.path.abspath(source), name)] = value
+
+
+def recall(source, name: str):
+    """Value stored with remember() for this image path in the active workspace, or None."""
+    workspace = _current_workspace.get()
+    if workspace is None or not isinstance(source, str):
+        return None
+    return workspace._artifacts.get((os.path.abspath(source), name))
+
+
+def load_image(source, draft_size=None) -> Image.Image:
+    """
+    RGB PIL image for a path, PIL image or HxWx3 array. Paths already
+    decoded in the active workspace are served from memory; the returned
+    image is shared, so callers must not modify it in place. Files read
+    from disk with a ``draft_size`` (width, height) are JPEG-decoded at the
+    smallest 1/2, 1/4 or 1/8 scale still at least that large.
+    """
+    if isinstance(source, Image.Image):
+        return source if source.mode == "RGB" else source.convert("RGB")
+    if isinstance(source, np.ndarray):
+        return Image.fromarray(source)
+    workspace = _current_workspace.get()
+    if workspace is not None:
+        image = workspace._images.get(os.path.abspath(source))
+        if image is not None:
+            return image
+    image = Image.open(source)
+    if draft_size is not None:
+        image.draft("RGB", draft_size)
+    return image.convert("RGB")
+
+
+def load_rgb_array(source, draft_size=None) -> np.ndarray:
+    """Read-only HxWx3 uint8 RGB array for a path, PIL image or array, decoded at most once per request."""
+    if isinstance(source, np.ndarray):
+        return source
+    workspace = _current_workspace.get()
+    if workspace is not None and not isinstance(source, Image.Image):
+        key = os.path.abspath(source)
+        array = workspace._arrays.get(key)
+        if array is None and key in workspace._images:
+            array = np.asarray(workspace._images[key])
+            workspace._arrays[key] = array
+        if array is not None:
+            return array
+    return np.asarray(load_image(source, draft_size))